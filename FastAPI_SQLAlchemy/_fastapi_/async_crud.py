@@ -0,0 +1,182 @@
+from sqlalchemy import select, func, literal, case, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload, aliased, load_only
+from .db import models
+
+import datetime
+
+
+async def get_group_by_Name(db: AsyncSession, group_name: str):
+    res = await db.execute(select(models.Group).where(models.Group.name == group_name))
+    return res.scalars().first()
+
+
+async def get_groups_by_Course(db: AsyncSession, course: int):
+    res = await db.execute(select(models.Group).where(models.Group.course == course))
+    return res.scalars().all()
+
+
+async def get_all_groups(db: AsyncSession):
+    res = await db.execute(select(models.Group.name).order_by(models.Group.name))
+    return res.scalars().all()
+
+
+async def get_groups_by_CourseAndAcType(db: AsyncSession, course: int, acType: str):
+    res = await db.execute(select(models.Group).where(models.Group.course == course,
+                                                      models.Group.academic_name == acType))
+    return res.scalars().all()
+
+
+async def get_teacher_by_Name(db: AsyncSession, teacher_name: str):
+    res = await db.execute(select(models.Teacher).where(models.Teacher.name == teacher_name))
+    return res.scalars().first()
+
+
+async def get_all_teachers(db: AsyncSession):
+    res = await db.execute(select(models.Teacher.name).order_by(models.Teacher.name))
+    return res.scalars().all()
+
+
+async def get_teacher_list(db: AsyncSession, lang: str, generation: int):
+    res = await db.execute(select(models.TeacherList.names).where(models.TeacherList.lang == lang,
+                                                                  models.TeacherList.generation == generation))
+    return res.scalars().first()
+
+
+async def save_teacher_list(db: AsyncSession, lang: str, generation: int, names: list):
+    # concurrent first requests for a language all insert its list, so the insert is an upsert
+    statement = insert(models.TeacherList).values(lang=lang, generation=generation, names=names)
+    # an older list never replaces the list of a newer generation
+    statement = statement.on_conflict_do_update(index_elements=[models.TeacherList.lang],
+                                                set_={"generation": statement.excluded.generation,
+                                                      "names": statement.excluded.names},
+                                                where=models.TeacherList.generation <= statement.excluded.generation)
+    await db.execute(statement)
+    await db.commit()
+
+
+def like_prefix(query: str):
+    return query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def teacher_prefix_rank(prefix: str):
+    # 0: prefix of the short name, 1: prefix of any word of the fullname, 2: fuzzy match only
+    return case((models.Teacher.name.ilike(prefix, escape="\\"), 0),
+                (or_(models.Teacher.fullname.ilike(prefix, escape="\\"),
+                     models.Teacher.fullname.ilike("% " + prefix, escape="\\")), 1),
+                else_=2)
+
+
+async def search_teachers(db: AsyncSession, query: str, limit: int):
+    # prefix matches of the short name or of any word of the fullname first, then fuzzy (pg_trgm) matches
+    prefix = like_prefix(query)
+    similarity = func.greatest(func.word_similarity(query, models.Teacher.name),
+                               func.word_similarity(query, models.Teacher.fullname))
+    res = await db.execute(select(models.Teacher.name, models.Teacher.fullname)
+                           .where(or_(models.Teacher.name.ilike(prefix, escape="\\"),
+                                      models.Teacher.fullname.ilike(prefix, escape="\\"),
+                                      models.Teacher.fullname.ilike("% " + prefix, escape="\\"),
+                                      literal(query).op("<%")(models.Teacher.name),
+                                      literal(query).op("<%")(models.Teacher.fullname)))
+                           .order_by(teacher_prefix_rank(prefix), similarity.desc(), models.Teacher.name)
+                           .limit(limit))
+    return res.all()
+
+
+async def search_groups(db: AsyncSession, query: str, limit: int):
+    prefix = like_prefix(query)
+    res = await db.execute(select(models.Group.name)
+                           .where(or_(models.Group.name.ilike(prefix, escape="\\"),
+                                      literal(query).op("<%")(models.Group.name)))
+                           .order_by(case((models.Group.name.ilike(prefix, escape="\\"), 0), else_=1),
+                                     func.word_similarity(query, models.Group.name).desc(), models.Group.name)
+                           .limit(limit))
+    return res.scalars().all()
+
+
+async def get_lessons_by_TeacherName(db: AsyncSession, teacher_name: str, active_on: datetime.date = None):
+    statement = select(models.Lesson) \
+        .join(models.LessonTeacher, models.LessonTeacher.lesson_id == models.Lesson.id) \
+        .join(models.Teacher, models.Teacher.id == models.LessonTeacher.teacher_id) \
+        .where(models.Teacher.name == teacher_name)
+    if active_on is not None:
+        statement = statement.where(models.lesson_is_active(active_on))
+    res = await db.execute(statement)
+    return res.scalars().all()
+
+
+async def get_lessons_groups_by_TeacherName(db: AsyncSession, teacher_name: str):
+    # lesson id -> names of every group that has the same lesson (same name, day, time, weeks and dates)
+    other = aliased(models.Lesson)
+    rows = await db.execute(select(models.Lesson.id, other.group_name)
+                            .join(models.LessonTeacher, models.LessonTeacher.lesson_id == models.Lesson.id)
+                            .join(models.Teacher, models.Teacher.id == models.LessonTeacher.teacher_id)
+                            .join(other, other.fingerprint == models.Lesson.fingerprint)
+                            .where(models.Teacher.name == teacher_name)
+                            .group_by(models.Lesson.id, other.group_name)
+                            .order_by(other.group_name))
+    res = {}
+    for lesson_id, group_name in rows:
+        res.setdefault(lesson_id, []).append(group_name)
+    return res
+
+
+async def get_lessons_by_GroupName(db: AsyncSession, group_name: str, active_on: datetime.date = None):
+    statement = select(models.Lesson).options(selectinload(models.Lesson.teachers)) \
+        .where(models.Lesson.group_name == group_name)
+    if active_on is not None:
+        statement = statement.where(models.lesson_is_active(active_on))
+    res = await db.execute(statement)
+    return res.scalars().all()
+
+
+async def get_lessons_by_DayAndGroupName(db: AsyncSession, group_name: str, day: str, active_on: datetime.date = None):
+    statement = select(models.Lesson).options(selectinload(models.Lesson.teachers)) \
+        .where(models.Lesson.group_name == group_name, models.Lesson.day == day)
+    if active_on is not None:
+        statement = statement.where(models.lesson_is_active(active_on))
+    res = await db.execute(statement)
+    return res.scalars().all()
+
+
+async def get_news_by_Id(db: AsyncSession, _id_: int):
+    res = await db.execute(select(models.News).where(models.News.id == _id_))
+    return res.scalars().first()
+
+
+async def get_news_by_Ids(db: AsyncSession, ids: list):
+    res = await db.execute(select(models.News).where(models.News.id.in_(ids)).order_by(models.News.id.desc()))
+    return res.scalars().all()
+
+
+async def get_news_feed(db: AsyncSession, before_id: int = None, limit: int = 20, category: str = None):
+    # keyset pagination: the page of news older than before_id, from the newest
+    statement = select(models.News).options(load_only(models.News.id, models.News.category, models.News.img_url,
+                                                      models.News.preview_date, models.News.preview_text))
+    if before_id is not None:
+        statement = statement.where(models.News.id < before_id)
+    if category is not None:
+        statement = statement.where(models.News.category == category)
+    res = await db.execute(statement.order_by(models.News.id.desc()).limit(limit))
+    return res.scalars().all()
+
+
+async def get_schedule_changes(db: AsyncSession, since: int, group_name: str = None, limit: int = 1000):
+    statement = select(models.ScheduleChange).where(models.ScheduleChange.version > since)
+    if group_name is not None:
+        statement = statement.where(models.ScheduleChange.group_name == group_name)
+    res = await db.execute(statement.order_by(models.ScheduleChange.version).limit(limit))
+    return res.scalars().all()
+
+
+async def get_schedule_changes_range(db: AsyncSession):
+    # (first, last) version kept in the log, (None, None) while it is empty
+    res = await db.execute(select(func.min(models.ScheduleChange.version), func.max(models.ScheduleChange.version)))
+    return tuple(res.first())
+
+
+async def get_generation(db: AsyncSession, name: str):
+    res = await db.execute(select(models.Generation.value).where(models.Generation.name == name))
+    value = res.scalars().first()
+    return 0 if value is None else value
@@ -1,10 +1,16 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from FastAPI_SQLAlchemy.config import settings
+from .pool_metrics import TimedQueuePool, TimedAsyncQueuePool
 
-engine = create_engine(settings.db_url)
+engine = create_engine(settings.db_url, poolclass=TimedQueuePool, **settings.db_pool_options)
 
 SessionLocal = sessionmaker(engine, autocommit=False, autoflush=False)
 
+async_engine = create_async_engine(settings.async_db_url, poolclass=TimedAsyncQueuePool, **settings.db_pool_options)
+
+AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
@@ -0,0 +1,137 @@
+from sqlalchemy import inspect, text, select, update, insert, delete, tuple_, bindparam, String
+from sqlalchemy.engine import Engine
+
+from .database import Base
+from . import models
+
+
+def create_extensions(bind: Engine):
+    # before create_all(): the trigram indexes of teachers and groups need pg_trgm
+    if bind.dialect.name == "postgresql":
+        with bind.begin() as connection:
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+
+def upgrade(bind: Engine):
+    # create_all() skips tables that already exist, so columns and indexes added later are created here
+    inspector = inspect(bind)
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    connection.execute(text("ALTER TABLE {} ADD COLUMN {} {}".format(
+                        table.name, column.name, column.type.compile(dialect=bind.dialect))))
+
+    convert_lesson_dates(bind)
+    # before ux_lessons_group_name_fingerprint is created
+    fill_lesson_fingerprints(bind)
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+    fill_lesson_grid_positions(bind)
+
+
+# column -> (new type, USING expression) for the lesson dates and times stored as "dd.mm.yyyy" / "hh:mm" strings
+LESSON_COLUMN_TYPES = {
+    "time_start": ("TIME", "NULLIF(time_start, '')::time"),
+    "time_end": ("TIME", "NULLIF(time_end, '')::time"),
+    "date_start": ("DATE", "to_date(NULLIF(date_start, ''), 'DD.MM.YYYY')"),
+    "date_end": ("DATE", "to_date(NULLIF(date_end, ''), 'DD.MM.YYYY')"),
+}
+
+
+def convert_lesson_dates(bind: Engine):
+    if bind.dialect.name != "postgresql":
+        return
+    columns = {column["name"]: column["type"] for column in inspect(bind).get_columns("lessons")}
+    with bind.begin() as connection:
+        for name, (type_, using) in LESSON_COLUMN_TYPES.items():
+            if isinstance(columns[name], String):
+                connection.execute(text("ALTER TABLE lessons ALTER COLUMN {} TYPE {} USING {}".format(name, type_, using)))
+
+
+def fill_lesson_grid_positions(bind: Engine):
+    # lessons imported before day_index / slot / week_mask existed
+    with bind.begin() as connection:
+        rows = connection.execute(select(models.Lesson.id, models.Lesson.day, models.Lesson.time_start,
+                                         models.Lesson.weeks).where(models.Lesson.week_mask.is_(None))).all()
+        params = []
+        for _id_, day, time_start, weeks in rows:
+            day_index, slot, week_mask = models.lesson_grid_position(day, time_start, weeks)
+            params.append({"_id_": _id_, "day_index": day_index, "slot": slot, "week_mask": week_mask})
+        if len(params) != 0:
+            connection.execute(update(models.Lesson.__table__)
+                               .where(models.Lesson.__table__.c.id == bindparam("_id_"))
+                               .values(day_index=bindparam("day_index"), slot=bindparam("slot"),
+                                       week_mask=bindparam("week_mask")), params)
+
+
+def fill_lesson_fingerprints(bind: Engine):
+    # lessons imported before fingerprints existed: the importer finds lessons by (group_name, fingerprint), so
+    # every row gets its fingerprint and rows of a group with the same one (a legacy row and the copy a later
+    # import inserted next to it) are merged into one, keeping the teachers of both
+    lessons = models.Lesson.__table__
+    links = models.LessonTeacher.__table__
+    teachers = models.Teacher.__table__
+    with bind.begin() as connection:
+        legacy = connection.execute(select(lessons.c.id, lessons.c.group_name, lessons.c.name, lessons.c.day,
+                                           lessons.c.time_start, lessons.c.time_end, lessons.c.weeks,
+                                           lessons.c.date_start, lessons.c.date_end)
+                                    .where(lessons.c.fingerprint.is_(None)).order_by(lessons.c.id)).all()
+        if len(legacy) == 0:
+            return
+
+        # (group_name, fingerprint) -> id of the row kept, rows fingerprinted by an import are kept first
+        kept = {}
+        for _id_, group_name, fingerprint in connection.execute(
+                select(lessons.c.id, lessons.c.group_name, lessons.c.fingerprint)
+                .where(lessons.c.fingerprint.isnot(None),
+                       lessons.c.group_name.in_(list({row.group_name for row in legacy})))):
+            kept[(group_name, fingerprint)] = _id_
+        params = []
+        merged = {}
+        for row in legacy:
+            key = (row.group_name, models.lesson_fingerprint(row.name, row.day, row.time_start, row.time_end,
+                                                             row.weeks, row.date_start, row.date_end))
+            if key in kept:
+                merged[row.id] = (kept[key], row.group_name)
+            else:
+                kept[key] = row.id
+                params.append({"_id_": row.id, "fingerprint": key[1]})
+
+        if len(merged) != 0:
+            moved = connection.execute(select(links.c.lesson_id, links.c.teacher_id)
+                                       .where(links.c.lesson_id.in_(list(merged)))).all()
+            wanted = {(merged[lesson_id][0], teacher_id) for lesson_id, teacher_id in moved}
+            existing = set(connection.execute(select(links.c.lesson_id, links.c.teacher_id)
+                                              .where(tuple_(links.c.lesson_id, links.c.teacher_id)
+                                                     .in_(list(wanted)))).all()) if len(wanted) != 0 else set()
+            added = sorted(wanted - existing)
+            connection.execute(delete(links).where(links.c.lesson_id.in_(list(merged))))
+            if len(added) != 0:
+                connection.execute(insert(links), [{"lesson_id": lesson_id, "teacher_id": teacher_id}
+                                                   for lesson_id, teacher_id in added])
+            connection.execute(delete(lessons).where(lessons.c.id.in_(list(merged))))
+            # clients following /schedule/changes/ drop the merged rows and get the teachers moved to the kept
+            # ones, as after an import; cached schedules are rebuilt
+            group_names = {kept_id: group_name for kept_id, group_name in merged.values()}
+            teacher_names = dict(connection.execute(select(teachers.c.id, teachers.c.name)
+                                                    .where(teachers.c.id.in_(list({t for _, t in added}))))
+                                 .all()) if len(added) != 0 else {}
+            connection.execute(insert(models.ScheduleChange.__table__),
+                               [{"kind": "lesson", "action": "delete", "group_name": group_name, "lesson_id": _id_,
+                                 "teacher_id": None, "data": None} for _id_, (_, group_name) in merged.items()] +
+                               [{"kind": "lesson_teacher", "action": "insert", "group_name": group_names[lesson_id],
+                                 "lesson_id": lesson_id, "teacher_id": teacher_id,
+                                 "data": {"teacher_name": teacher_names[teacher_id]}}
+                                for lesson_id, teacher_id in added])
+            connection.execute(update(models.Generation.__table__)
+                               .where(models.Generation.__table__.c.name == "schedule")
+                               .values(value=models.Generation.__table__.c.value + 1))
+
+        if len(params) != 0:
+            connection.execute(update(lessons).where(lessons.c.id == bindparam("_id_"))
+                               .values(fingerprint=bindparam("fingerprint")), params)
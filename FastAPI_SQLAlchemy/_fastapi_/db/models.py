@@ -1,8 +1,12 @@
 from .database import Base
-from sqlalchemy import Column, Boolean, String, Integer, ForeignKey, PrimaryKeyConstraint
-from sqlalchemy.orm import relationship, Session
+from sqlalchemy import Column, Boolean, String, Integer, SmallInteger, Text, JSON, Date, Time, LargeBinary, \
+    ForeignKey, PrimaryKeyConstraint, Index, and_, or_
+from sqlalchemy.orm import relationship
 from sqlalchemy.ext.hybrid import hybrid_property, hybrid_method
-import collections
+import bisect
+import datetime
+import functools
+import hashlib
 
 
 class Group(Base):
@@ -14,6 +18,10 @@ class Group(Base):
 
     lessons = relationship("Lesson", back_populates="group")
 
+    __table_args__ = (
+        Index("ix_groups_name_trgm", name, postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+    )
+
 
 class Teacher(Base):
     __tablename__ = "teachers"
@@ -27,6 +35,13 @@ class Teacher(Base):
 
     lesson_teacher = relationship("LessonTeacher", back_populates="teacher")
 
+    # trigram indexes for /search (pg_trgm, see migrations.create_extensions)
+    __table_args__ = (
+        Index("ix_teachers_name_trgm", name, postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_teachers_fullname_trgm", fullname, postgresql_using="gin",
+              postgresql_ops={"fullname": "gin_trgm_ops"}),
+    )
+
     @hybrid_method
     def __repr__(self):
         return "ModelTeacher:\n" \
@@ -40,56 +55,44 @@ class Lesson(Base):
     __tablename__ = "lessons"
 
     id = Column(Integer, primary_key=True)
-    time_start = Column(String(50))
-    time_end = Column(String(50))
+    time_start = Column(Time)
+    time_end = Column(Time)
     dot = Column(Boolean, default=False)
     cabinet = Column(String(50))
     type = Column(String(10))
     weeks = Column(String(10))
     name = Column(String(200))
     subgroup = Column(String(100))
-    date_start = Column(String(15))
-    date_end = Column(String(15))
+    date_start = Column(Date)
+    date_end = Column(Date)
     day = Column(String(15))
+    # hash of the lesson identity (see lesson_fingerprint), equal for the same lesson of different groups
+    fingerprint = Column(String(40))
+    # position in the week grid and weeks as bits (week i -> bit i - 1), see lesson_grid_position
+    day_index = Column(SmallInteger)
+    slot = Column(SmallInteger)
+    week_mask = Column(Integer)
 
     group_name = Column(String(50), ForeignKey("groups.name"), nullable=False)
     group = relationship("Group", back_populates="lessons")
 
     lesson_teacher = relationship("LessonTeacher", back_populates="lesson")
+    teachers = relationship("Teacher", secondary="lessons_teachers", viewonly=True)
 
-    @hybrid_method
-    def teachers(self, db: Session):
-        res = []
-        for item in db.query(LessonTeacher).filter(LessonTeacher.lesson_id == self.id).all():
-            res.append(db.query(Teacher).filter(Teacher.id == item.teacher_id).first())
-        return res
-
-    @hybrid_method
-    def groups(self, db: Session):
-        res = []
-        for item in db.query(Lesson).filter(Lesson.time_start == self.time_start,
-                                            Lesson.time_end == self.time_end,
-                                            Lesson.weeks == self.weeks,
-                                            Lesson.date_start == self.date_start,
-                                            Lesson.date_end == self.date_end,
-                                            Lesson.day == self.day,
-                                            Lesson.name == self.name).all():
-            res.append(item.group_name)
-        return res
-
-    @hybrid_method
-    def __eq__(self, other):
-        return self.time_start == other.time_start and\
-               self.time_end == other.time_end and\
-               collections.Counter(self.weeks) == collections.Counter(other.weeks) and\
-               self.name == other.name and\
-               self.date_start == other.date_start and\
-               self.date_end == other.date_end and\
-               self.day == other.day
+    __table_args__ = (
+        Index("ix_lessons_group_name_day", group_name, day),
+        Index("ix_lessons_fingerprint", fingerprint),
+        Index("ux_lessons_group_name_fingerprint", group_name, fingerprint, unique=True),
+        Index("ix_lessons_date_start_date_end", date_start, date_end),
+    )
 
-    @hybrid_method
-    def __hash__(self):
-        return hash(self.id)
+    @property
+    def identity_key(self):
+        # equal for the same lesson of different groups, rows imported before fingerprints existed hash on the fly
+        if self.fingerprint is not None:
+            return self.fingerprint
+        return lesson_fingerprint(self.name, self.day, self.time_start, self.time_end, self.weeks,
+                                  self.date_start, self.date_end)
 
     @hybrid_method
     def __repr__(self):
@@ -101,6 +104,74 @@ class Lesson(Base):
                ")".format(self.name, self.day, self.group_name, self.time_start, self.weeks)
 
 
+LESSON_DATE_FORMAT = "%d.%m.%Y"
+LESSON_TIME_FORMAT = "%H:%M"
+
+
+def lesson_date(value):
+    # "dd.mm.yyyy" from the parser -> date
+    if value is None or isinstance(value, datetime.date):
+        return value
+    return datetime.datetime.strptime(value.strip(), LESSON_DATE_FORMAT).date() if value.strip() != "" else None
+
+
+def lesson_time(value):
+    # "hh:mm" from the parser -> time
+    if value is None or isinstance(value, datetime.time):
+        return value
+    return datetime.datetime.strptime(value.strip(), LESSON_TIME_FORMAT).time() if value.strip() != "" else None
+
+
+def lesson_is_active(day: datetime.date):
+    # lessons with both dates run from date_start to date_end, lessons with only date_start are held on that day
+    return or_(Lesson.date_start.is_(None),
+               and_(Lesson.date_end.is_(None), Lesson.date_start == day),
+               and_(Lesson.date_start <= day, Lesson.date_end >= day))
+
+
+def lesson_fingerprint(name, day, time_start, time_end, weeks, date_start, date_end):
+    # dates and times are hashed in the parser formats, so fingerprints do not depend on the column types
+    identity = [name, day,
+                time_start.strftime(LESSON_TIME_FORMAT) if isinstance(time_start, datetime.time) else time_start,
+                time_end.strftime(LESSON_TIME_FORMAT) if isinstance(time_end, datetime.time) else time_end,
+                weeks,
+                date_start.strftime(LESSON_DATE_FORMAT) if isinstance(date_start, datetime.date) else date_start,
+                date_end.strftime(LESSON_DATE_FORMAT) if isinstance(date_end, datetime.date) else date_end]
+    return hashlib.sha1("\x1f".join("" if item is None else str(item) for item in identity).encode("utf-8")).hexdigest()
+
+
+LESSON_DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday"]
+# (start, end) of every lesson slot of the day
+LESSON_SLOTS = [(datetime.time(8, 30), datetime.time(10, 5)), (datetime.time(10, 15), datetime.time(11, 45)),
+                (datetime.time(11, 55), datetime.time(14, 20)), (datetime.time(14, 30), datetime.time(16, 5)),
+                (datetime.time(16, 15), datetime.time(17, 45)), (datetime.time(17, 55), datetime.time(20, 20)),
+                (datetime.time(20, 25), datetime.time(21, 10)), (datetime.time(21, 20), datetime.time(22, 50))]
+LESSON_SLOT_STARTS = [start for start, _ in LESSON_SLOTS]
+WEEKS_COUNT = 16
+WEEK_MASKS = {
+    "еженед": sum(1 << (week - 1) for week in range(1, WEEKS_COUNT + 1)),
+    "чет": sum(1 << (week - 1) for week in range(2, WEEKS_COUNT + 1, 2)),
+    "нечет": sum(1 << (week - 1) for week in range(1, WEEKS_COUNT, 2)),
+}
+
+
+def lesson_grid_position(day, time_start, weeks):
+    # (day_index, slot, week_mask), slot is None if time_start is outside of every slot
+    day_index = LESSON_DAYS.index(day) if day in LESSON_DAYS else None
+    time_start = lesson_time(time_start)
+    slot = None
+    if time_start is not None:
+        i = bisect.bisect_right(LESSON_SLOT_STARTS, time_start) - 1
+        if i >= 0 and time_start <= LESSON_SLOTS[i][1]:
+            slot = i
+    return day_index, slot, WEEK_MASKS.get(weeks, WEEK_MASKS["нечет"])
+
+
+@functools.lru_cache(maxsize=None)
+def lesson_weeks(week_mask):
+    return [week for week in range(1, WEEKS_COUNT + 1) if week_mask >> (week - 1) & 1]
+
+
 class LessonTeacher(Base):
     __tablename__ = "lessons_teachers"
 
@@ -109,6 +180,7 @@ class LessonTeacher(Base):
 
     __table_args__ = (
         PrimaryKeyConstraint(lesson_id, teacher_id),
+        Index("ix_lessons_teachers_teacher_id", teacher_id),
     )
 
     lesson = relationship("Lesson", back_populates="lesson_teacher")
@@ -118,6 +190,69 @@ class LessonTeacher(Base):
 class News(Base):
     __tablename__ = "news"
 
+    # ids grow with the publication date, the newest news has the biggest id
     id = Column(Integer, primary_key=True)
+    url = Column(String(300), unique=True)
+    category = Column(String(20))
+    # preview
+    img_url = Column(String(300))
+    preview_date = Column(String(50))
+    preview_text = Column(String(500))
+    # page
+    title = Column(String(500))
+    date = Column(String(50))
+    text = Column(Text)
+    images_url = Column(JSON)
+    # files of the news stored before the news moved into the db, only read by news_files_to_db
     pathToPreview = Column(String(150), unique=True)
     pathToNews = Column(String(150), unique=True)
+
+    __table_args__ = (
+        Index("ix_news_category_id", category, id),
+    )
+
+
+class TeacherList(Base):
+    # sorted teacher names translated to lang, built for the "teachers" generation
+    __tablename__ = "teacher_lists"
+
+    lang = Column(String(10), primary_key=True)
+    generation = Column(Integer, nullable=False)
+    names = Column(JSON, nullable=False)
+
+
+class ScheduleChange(Base):
+    # changes of lessons and lessons_teachers made by the schedule import, version grows with every change
+    __tablename__ = "schedule_changes"
+
+    version = Column(Integer, primary_key=True)
+    # "lesson" or "lesson_teacher"
+    kind = Column(String(20), nullable=False)
+    # "insert", "update" or "delete"
+    action = Column(String(10), nullable=False)
+    group_name = Column(String(50), nullable=False)
+    lesson_id = Column(Integer, nullable=False)
+    teacher_id = Column(Integer)
+    # the lesson for inserted / updated lessons, the teacher for links
+    data = Column(JSON)
+
+    __table_args__ = (
+        Index("ix_schedule_changes_group_name_version", group_name, version),
+    )
+
+
+class Snapshot(Base):
+    # gzipped msgpack of the whole timetable for the "schedule" generation, see _fastapi_/snapshot.py
+    __tablename__ = "snapshots"
+
+    name = Column(String(50), primary_key=True)
+    generation = Column(Integer, nullable=False)
+    etag = Column(String(50), nullable=False)
+    data = Column(LargeBinary, nullable=False)
+
+
+class Generation(Base):
+    __tablename__ = "generations"
+
+    name = Column(String(50), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
@@ -1,7 +1,7 @@
-from sqlalchemy.orm import Session
 from pydantic import BaseModel, HttpUrl, Field
 from typing import Union
 import collections
+import datetime
 
 from FastAPI_SQLAlchemy._fastapi_.db import models
 from FastAPI_SQLAlchemy.translator import translator as tr
@@ -58,9 +58,6 @@ class TeacherOutput(TeacherBase):
         self.online_url = item.online_url
         self.alt_online_url = item.alt_online_url
 
-    def translate_str(self):
-        return self.name + " _ " + self.fullname + " _ " + self.online_url + " _ " + self.alt_online_url
-
 
 class Teacher(TeacherBase):
     class Config:
@@ -91,108 +88,46 @@ class LessonOutput(LessonBase):
     tr_teacher_name: Union[list[str], None] = None
     tr_teacher_fullname: Union[list[str], None] = None
 
-    def __init__(self, item: models.Lesson, db: Session):
+    def __init__(self, item: models.Lesson):
         super().__init__()
-        self.time_start = item.time_start
-        self.time_end = item.time_end
+        self.time_start = item.time_start.strftime(models.LESSON_TIME_FORMAT) if item.time_start is not None else None
+        self.time_end = item.time_end.strftime(models.LESSON_TIME_FORMAT) if item.time_end is not None else None
         self.dot = item.dot
         self.cabinet = item.cabinet
         self.type = item.type
-        if item.weeks == "еженед":
-            self.weeks = [i for i in range(1, 17)]
-        elif item.weeks == "чет":
-            self.weeks = [i for i in range(2, 17, 2)]
-        else:
-            self.weeks = [i for i in range(1, 16, 2)]
+        self.weeks = models.lesson_weeks(item.week_mask)
         self.name = item.name
         self.subgroup = item.subgroup
-        teachers = item.teachers(db)
-        self.teacher_name = [TeacherOutput(teacher).name for teacher in teachers]
-        self.teacher_fullname = [TeacherOutput(teacher).fullname for teacher in teachers]
+        self.teacher_name = [teacher.name for teacher in item.teachers]
+        self.teacher_fullname = [teacher.fullname for teacher in item.teachers]
         self.tr_teacher_name = []
         self.tr_teacher_fullname = []
 
-    def translate_str(self):
-        type_ = "#"
-        if self.type == 'Лек':
-            type_ = "Лекция"
-        elif self.type == 'Пр':
-            type_ = "Практика"
-        elif self.type == 'Лаб':
-            type_ = "Лабораторная работа"
-
-        # trans = name + teacher_name + teacher_fullname + subgroup + type
-        #     # = None
-        if self.subgroup is None:
-            if len(self.teacher_name) == 0:
-                if len(self.teacher_fullname) == 0:
-                    return "{} + # + # + # + {} | ".format(self.name, type_)
-                else:
-                    return "{} + # + {} + # + {} | ".format(self.name, " _ ".join(self.teacher_fullname), type_)
-            else:
-                if len(self.teacher_fullname) == 0:
-                    return "{} + {} + # + # + {} | ".format(self.name, " _ ".join(self.teacher_name), type_)
-                else:
-                    return "{} + {} + {} + # + {} | ".format(self.name, " _ ".join(self.teacher_name),
-                                                             " _ ".join(self.teacher_fullname), type_)
-        else:
-            if len(self.teacher_name) == 0:
-                if len(self.teacher_fullname) == 0:
-                    return "{} + # + # + {} + {} | ".format(self.name, self.subgroup, type_)
-                else:
-                    return "{} + # + {} + {} + {} | ".format(self.name, " _ ".join(self.teacher_fullname),
-                                                             self.subgroup, type_)
-            else:
-                if len(self.teacher_fullname) == 0:
-                    return "{} + {} + # + {} + {} | ".format(self.name, " _ ".join(self.teacher_name),
-                                                             self.subgroup, type_)
-                else:
-                    return "{} + {} + {} + {} + {} | ".format(self.name, " _ ".join(self.teacher_name),
-                                                              " _ ".join(self.teacher_fullname), self.subgroup, type_)
-
 
 class LessonOutputT(LessonBase):
     group_name: Union[list[str], None] = None
 
-    def __init__(self, item: models.Lesson, db: Session):
+    def __init__(self, item: models.Lesson, groups: list[str]):
         super().__init__()
-        self.time_start = item.time_start
-        self.time_end = item.time_end
+        self.time_start = item.time_start.strftime(models.LESSON_TIME_FORMAT) if item.time_start is not None else None
+        self.time_end = item.time_end.strftime(models.LESSON_TIME_FORMAT) if item.time_end is not None else None
         self.dot = item.dot
         self.cabinet = item.cabinet
         self.type = item.type
-        if item.weeks == "еженед":
-            self.weeks = [i for i in range(1, 17)]
-        elif item.weeks == "чет":
-            self.weeks = [i for i in range(2, 17, 2)]
-        else:
-            self.weeks = [i for i in range(1, 16, 2)]
+        self.weeks = models.lesson_weeks(item.week_mask)
         self.name = item.name
         self.subgroup = item.subgroup
-        self.group_name = [it for it in item.groups(db)]
-
-    def translate_str(self):
-        type_ = "#"
-        if self.type == 'Лек':
-            type_ = "Лекция"
-        elif self.type == 'Пр':
-            type_ = "Практика"
-        elif self.type == 'Лаб':
-            type_ = "Лабораторная работа"
-
-        # trans = name + subgroup + type
-        if self.subgroup is None:
-            return "{} + # + {} | ".format(self.name, type_)
-        else:
-            return "{} + {} + {} | ".format(self.name, self.subgroup, type_)
+        self.group_name = groups
 
 
 class Lesson(LessonBase):
     id: int
+    time_start: Union[datetime.time, None] = None
+    time_end: Union[datetime.time, None] = None
     day: Union[str, None] = None
     group_name: Union[str, None] = None
-    date_start: Union[str, None] = None
-    date_end: Union[str, None] = None
+    date_start: Union[datetime.date, None] = None
+    date_end: Union[datetime.date, None] = None
 
     class Config:
         orm_mode = True
@@ -220,16 +155,55 @@ class LessonTeacher(LessonTeacherBase):
 
 
 class NewsBase(BaseModel):
-    pathToPreview: Union[str, None] = None
-    pathToNews: Union[str, None] = None
+    url: Union[str, None] = None
+    category: Union[str, None] = None
+    img_url: Union[str, None] = None
+    preview_date: Union[str, None] = None
+    preview_text: Union[str, None] = None
+    title: Union[str, None] = None
+    date: Union[str, None] = None
+    text: Union[str, None] = None
+    images_url: Union[list[str], None] = None
 
 
 class NewsCreate(NewsBase):
     pass
 
 
-class NewsOutput(NewsBase):
-    pass
+class NewsPreviewOutput(BaseModel):
+    img_url: Union[str, None] = None
+    date: Union[str, None] = None
+    text: Union[str, None] = None
+
+    def __init__(self, item: models.News):
+        super().__init__()
+        self.img_url = item.img_url
+        self.date = item.preview_date
+        self.text = item.preview_text
+
+
+class NewsFeedOutput(NewsPreviewOutput):
+    id: Union[int, None] = None
+    category: Union[str, None] = None
+
+    def __init__(self, item: models.News):
+        super().__init__(item)
+        self.id = item.id
+        self.category = item.category
+
+
+class NewsPageOutput(BaseModel):
+    title: Union[str, None] = None
+    date: Union[str, None] = None
+    images_url: Union[list[str], None] = None
+    text: Union[str, None] = None
+
+    def __init__(self, item: models.News):
+        super().__init__()
+        self.title = item.title
+        self.date = item.date
+        self.images_url = item.images_url
+        self.text = item.text
 
 
 class News(NewsBase):
@@ -237,3 +211,24 @@ class News(NewsBase):
 
     class Config:
         orm_mode = True
+
+
+# Schedule change
+class ScheduleChangeOutput(BaseModel):
+    version: Union[int, None] = None
+    kind: Union[str, None] = None
+    action: Union[str, None] = None
+    group_name: Union[str, None] = None
+    lesson_id: Union[int, None] = None
+    teacher_id: Union[int, None] = None
+    data: Union[dict, None] = None
+
+    def __init__(self, item: models.ScheduleChange):
+        super().__init__()
+        self.version = item.version
+        self.kind = item.kind
+        self.action = item.action
+        self.group_name = item.group_name
+        self.lesson_id = item.lesson_id
+        self.teacher_id = item.teacher_id
+        self.data = item.data
@@ -0,0 +1,85 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import logging
+import threading
+import uuid
+
+from FastAPI_SQLAlchemy.config import settings
+
+
+class Job:
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.progress = None
+        self.result = None
+        self.error = None
+        self.created = datetime.datetime.now()
+        self.started = None
+        self.finished = None
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def info(self):
+        return {"id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "progress": self.progress,
+                "result": self.result,
+                "error": self.error,
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished}
+
+
+class JobRunner:
+    # runs crawls and imports outside of the request handlers, at most one job of every kind at a time
+    def __init__(self, workers: int, history_size: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.history_size = history_size
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, kind: str, func, *args, **kwargs):
+        # func(job, *args, **kwargs) may report job.progress, its return value becomes job.result;
+        # if a job of this kind is still queued or running, that job is returned instead of a new one
+        with self.lock:
+            for job in self.jobs.values():
+                if job.kind == kind and job.active:
+                    return job
+            job = Job(kind)
+            self.jobs[job.id] = job
+            while len(self.jobs) > self.history_size:
+                oldest = next(iter(self.jobs.values()))
+                if oldest.active:
+                    break
+                self.jobs.popitem(last=False)
+        self.executor.submit(self.run, job, func, *args, **kwargs)
+        return job
+
+    def run(self, job: Job, func, *args, **kwargs):
+        job.status = "running"
+        job.started = datetime.datetime.now()
+        try:
+            job.result = func(job, *args, **kwargs)
+            job.status = "done"
+        except (Exception,) as err:
+            logging.exception(err)
+            job.error = repr(err)
+            job.status = "failed"
+        job.finished = datetime.datetime.now()
+
+    def get(self, job_id: str):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self.lock:
+            return list(self.jobs.values())
+
+
+runner = JobRunner(settings.job_workers, settings.job_history_size)
@@ -0,0 +1,35 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import async_crud
+from .db import models
+
+
+class NewsIndex:
+    # client news number -> news id, the news number 1 is the newest one
+    def __init__(self):
+        self.generation = None
+        self.ids = []
+
+    async def refresh(self, db: AsyncSession):
+        # reloaded only after news_info_to_db bumped the "news" generation
+        generation = await async_crud.get_generation(db, "news")
+        if generation != self.generation:
+            res = await db.execute(select(models.News.id).order_by(models.News.id.desc()))
+            self.ids = res.scalars().all()
+            self.generation = generation
+        return self.ids
+
+    async def get_id(self, db: AsyncSession, number: int):
+        ids = await self.refresh(db)
+        if 1 <= number <= len(ids):
+            return ids[number - 1]
+        return None
+
+    async def get_ids(self, db: AsyncSession, start: int, end: int):
+        # ids of the news with numbers start <= number < end
+        ids = await self.refresh(db)
+        return ids[max(start, 1) - 1:max(end - 1, 0)]
+
+
+index = NewsIndex()
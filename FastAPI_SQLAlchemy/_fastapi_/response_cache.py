@@ -0,0 +1,47 @@
+from collections import OrderedDict
+from typing import Union
+import hashlib
+import json
+import threading
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+
+from FastAPI_SQLAlchemy.config import settings
+
+
+class ResponseCache:
+    def __init__(self, size: int):
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: tuple):
+        with self.lock:
+            if key not in self.items:
+                return None
+            self.items.move_to_end(key)
+            return self.items[key]
+
+    def set(self, key: tuple, content):
+        body = json.dumps(jsonable_encoder(content), ensure_ascii=False).encode("utf-8")
+        item = (body, '"{}"'.format(hashlib.sha1(body).hexdigest()))
+        with self.lock:
+            self.items[key] = item
+            self.items.move_to_end(key)
+            if len(self.items) > self.size:
+                self.items.popitem(last=False)
+        return item
+
+
+def make_response(item: tuple, if_none_match: Union[str, None] = None, media_type: str = "application/json"):
+    body, etag = item
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        if etag in tags or "W/" + etag in tags or "*" in tags:
+            return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type=media_type,
+                    headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+cache = ResponseCache(settings.response_cache_size)
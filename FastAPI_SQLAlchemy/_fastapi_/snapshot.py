@@ -0,0 +1,133 @@
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+import datetime
+import gzip
+import hashlib
+import msgpack
+import threading
+
+from . import async_crud, crud
+from .db import models
+
+# bump when the layout changes, clients drop snapshots of a version they do not know
+SNAPSHOT_VERSION = 1
+EPOCH = datetime.date(1970, 1, 1).toordinal()
+# the import and the requests that miss the snapshot build it one at a time
+build_lock = threading.Lock()
+
+
+class StringTable:
+    # every string (group, lesson, cabinet...) is stored once, columns keep its index, -1 is None
+    def __init__(self):
+        self.strings = []
+        self.refs = {}
+
+    def ref(self, string):
+        if string is None:
+            return -1
+        if string not in self.refs:
+            self.refs[string] = len(self.strings)
+            self.strings.append(string)
+        return self.refs[string]
+
+
+def minutes(value: datetime.time):
+    return None if value is None else value.hour * 60 + value.minute
+
+
+def days(value: datetime.date):
+    return None if value is None else value.toordinal() - EPOCH
+
+
+def build_snapshot(db: Session, generation: int):
+    # the whole timetable as gzipped msgpack, one list per column: times in minutes since midnight,
+    # dates in days since 1970-01-01, lessons_teachers links lessons and teachers by id;
+    # changes_version is the last schedule_changes version included, /schedule/changes/ goes on from it
+    changes_version = db.query(func.max(models.ScheduleChange.version)).scalar() or 0
+    strings = StringTable()
+    groups = {"name": [], "course": [], "academic_name": []}
+    for name, course, academic_name in db.query(models.Group.name, models.Group.course, models.Group.academic_name) \
+            .order_by(models.Group.name):
+        groups["name"].append(strings.ref(name))
+        groups["course"].append(course)
+        groups["academic_name"].append(strings.ref(academic_name))
+
+    teachers = {"id": [], "name": [], "fullname": []}
+    for _id_, name, fullname in db.query(models.Teacher.id, models.Teacher.name, models.Teacher.fullname) \
+            .order_by(models.Teacher.id):
+        teachers["id"].append(_id_)
+        teachers["name"].append(strings.ref(name))
+        teachers["fullname"].append(strings.ref(fullname))
+
+    lessons = {"id": [], "group": [], "name": [], "type": [], "cabinet": [], "subgroup": [], "dot": [], "day": [],
+               "slot": [], "week_mask": [], "time_start": [], "time_end": [], "date_start": [], "date_end": []}
+    for row in db.query(models.Lesson.id, models.Lesson.group_name, models.Lesson.name, models.Lesson.type,
+                        models.Lesson.cabinet, models.Lesson.subgroup, models.Lesson.dot, models.Lesson.day_index,
+                        models.Lesson.slot, models.Lesson.week_mask, models.Lesson.time_start,
+                        models.Lesson.time_end, models.Lesson.date_start, models.Lesson.date_end) \
+            .order_by(models.Lesson.id):
+        lessons["id"].append(row.id)
+        lessons["group"].append(strings.ref(row.group_name))
+        lessons["name"].append(strings.ref(row.name))
+        lessons["type"].append(strings.ref(row.type))
+        lessons["cabinet"].append(strings.ref(row.cabinet))
+        lessons["subgroup"].append(strings.ref(row.subgroup))
+        lessons["dot"].append(bool(row.dot))
+        lessons["day"].append(row.day_index)
+        lessons["slot"].append(row.slot)
+        lessons["week_mask"].append(row.week_mask)
+        lessons["time_start"].append(minutes(row.time_start))
+        lessons["time_end"].append(minutes(row.time_end))
+        lessons["date_start"].append(days(row.date_start))
+        lessons["date_end"].append(days(row.date_end))
+
+    links = {"lesson_id": [], "teacher_id": []}
+    for lesson_id, teacher_id in db.query(models.LessonTeacher.lesson_id, models.LessonTeacher.teacher_id) \
+            .order_by(models.LessonTeacher.lesson_id, models.LessonTeacher.teacher_id):
+        links["lesson_id"].append(lesson_id)
+        links["teacher_id"].append(teacher_id)
+
+    # mtime=0: the same timetable always gives the same bytes and so the same etag
+    return gzip.compress(msgpack.packb({"version": SNAPSHOT_VERSION,
+                                        "generation": generation,
+                                        "changes_version": changes_version,
+                                        "strings": strings.strings,
+                                        "groups": groups,
+                                        "teachers": teachers,
+                                        "lessons": lessons,
+                                        "lessons_teachers": links}), compresslevel=9, mtime=0)
+
+
+def save_snapshot(db: Session, only_missing: bool = False):
+    # built once per "schedule" generation, by the import or by the first request after it;
+    # with only_missing the requests waiting for a build do not build the same generation again
+    with build_lock:
+        generation = crud.get_generation(db, "schedule")
+        if only_missing and crud.get_snapshot_generation(db, "schedule") == generation:
+            return None
+        data = build_snapshot(db, generation)
+        crud.save_snapshot(db, "schedule", generation, '"{}"'.format(hashlib.sha1(data).hexdigest()), data)
+        return {"generation": generation, "size": len(data)}
+
+
+class SnapshotCache:
+    # the stored snapshot of the current generation, read from the db once per generation
+    def __init__(self):
+        self.generation = None
+        self.item = None
+
+    async def get(self, db: AsyncSession):
+        generation = await async_crud.get_generation(db, "schedule")
+        if generation != self.generation:
+            res = await db.execute(select(models.Snapshot.data, models.Snapshot.etag)
+                                   .where(models.Snapshot.name == "schedule", models.Snapshot.generation == generation))
+            row = res.first()
+            if row is None:
+                return None
+            self.item = (row.data, row.etag)
+            self.generation = generation
+        return self.item
+
+
+cache = SnapshotCache()
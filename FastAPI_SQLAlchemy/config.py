@@ -1,8 +1,40 @@
+from typing import Union
+
 from pydantic import BaseSettings, Field
 
 
 class Settings(BaseSettings):
     db_url: str = Field(..., env='DATABASE_URL')
+    db_async_url: Union[str, None] = Field(None, env='ASYNC_DATABASE_URL')
+    db_pool_size: int = Field(5, env='DB_POOL_SIZE')
+    db_max_overflow: int = Field(10, env='DB_MAX_OVERFLOW')
+    db_pool_timeout: float = Field(30, env='DB_POOL_TIMEOUT')
+    db_pool_recycle: int = Field(1800, env='DB_POOL_RECYCLE')
+    db_pool_pre_ping: bool = Field(True, env='DB_POOL_PRE_PING')
+    translation_cache_path: str = Field("FastAPI_SQLAlchemy/translator/cache.sqlite3", env='TRANSLATION_CACHE_PATH')
+    translation_cache_size: int = Field(20000, env='TRANSLATION_CACHE_SIZE')
+    translation_workers: int = Field(8, env='TRANSLATION_WORKERS')
+    response_cache_size: int = Field(5000, env='RESPONSE_CACHE_SIZE')
+    # languages of the teacher lists built after every roster change, other ones are built on the first request
+    teacher_list_langs: list[str] = Field(["ru", "en"], env='TEACHER_LIST_LANGS')
+    job_workers: int = Field(3, env='JOB_WORKERS')
+    job_history_size: int = Field(100, env='JOB_HISTORY_SIZE')
+    # entries of the schedule change log kept after every import, older clients resync from the snapshot
+    schedule_changes_keep: int = Field(500000, env='SCHEDULE_CHANGES_KEEP')
+
+    @property
+    def db_pool_options(self):
+        return {"pool_size": self.db_pool_size,
+                "max_overflow": self.db_max_overflow,
+                "pool_timeout": self.db_pool_timeout,
+                "pool_recycle": self.db_pool_recycle,
+                "pool_pre_ping": self.db_pool_pre_ping}
+
+    @property
+    def async_db_url(self):
+        if self.db_async_url is not None:
+            return self.db_async_url
+        return self.db_url.replace("postgresql://", "postgresql+asyncpg://", 1)
 
 
 settings = Settings()
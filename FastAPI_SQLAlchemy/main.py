@@ -1,17 +1,23 @@
-import json
+import datetime
 import logging
 import time
 import types
+from typing import Union
 
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import FastAPI, Depends, HTTPException, Header
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 import uvicorn
 
 from ._fastapi_ import response_detail as rd
-from ._fastapi_ import crud
-from ._fastapi_.db import models, schemas
-from ._fastapi_.db.database import SessionLocal, engine
+from ._fastapi_ import async_crud
+from ._fastapi_.db import models, schemas, migrations
+from ._fastapi_.db.database import SessionLocal, AsyncSessionLocal, engine, async_engine
 from ._fastapi_ import tools
+from ._fastapi_ import response_cache
+from ._fastapi_ import news_index
+from ._fastapi_ import jobs
+from ._fastapi_ import snapshot
 
 from FastAPI_SQLAlchemy.parsing import input_parse_info
 from FastAPI_SQLAlchemy.parsing import schedule_parser as sp
@@ -19,9 +25,14 @@ from FastAPI_SQLAlchemy.parsing import news_parser as np
 
 from .translator import translator as tr
 
+migrations.create_extensions(engine)
 models.Base.metadata.create_all(bind=engine)
+migrations.upgrade(engine)
 app = FastAPI()
 logFilename = "FastAPI_SQLAlchemy/logs/log1"
+NEWS_FEED_MAX_LIMIT = 100
+SEARCH_MAX_LIMIT = 50
+SCHEDULE_CHANGES_MAX_LIMIT = 5000
 
 
 def get_db():
@@ -32,6 +43,11 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 logging.basicConfig(filename=logFilename, level=logging.INFO, format='%(asctime)s - %(message)s',
                     datefmt='%d-%b-%y %H:%M:%S')
 
@@ -43,17 +59,29 @@ async def main():
     return "It's host for MEPhI app. To check the api, please, idite nahui!!!"
 
 
+@app.get("/metrics/db_pool/")
+async def get_db_pool_metrics():
+    return {"sync": engine.pool.metrics.snapshot(engine.pool),
+            "async": async_engine.pool.metrics.snapshot(async_engine.pool)}
+
+
 @app.get("/all_lessons_by_group/", response_model=dict)
-async def get_lessons_by_group(group_name: str, lang: str = 'ru', db: Session = Depends(get_db)):
+async def get_lessons_by_group(group_name: str, lang: str = 'ru', if_none_match: Union[str, None] = Header(None),
+                               db: AsyncSession = Depends(get_async_db)):
     try:
         logging.info("API: get_lessons_by_group | --args: {} | --status: Get requests".format(group_name))
-        db_lessons = crud.get_lessons_by_GroupName(db, group_name)
-        if len(db_lessons) == 0:
-            logging.error("API: get_lessons_by_group | --args: {} | --status: Status_code = 406".format(group_name))
-            raise HTTPException(status_code=406, detail=rd.unexpected_parameters_406)
-        lessons = {"group": group_name} | tools.output_From_DBLesson(db_lessons, db=db, dest=lang)
+        today = datetime.date.today()
+        key = ("all_lessons_by_group", await async_crud.get_generation(db, "schedule"), group_name, lang, today)
+        lessons = response_cache.cache.get(key)
+        if lessons is None:
+            db_lessons = await async_crud.get_lessons_by_GroupName(db, group_name, active_on=today)
+            if len(db_lessons) == 0 and await async_crud.get_group_by_Name(db, group_name) is None:
+                logging.error("API: get_lessons_by_group | --args: {} | --status: Status_code = 406".format(group_name))
+                raise HTTPException(status_code=406, detail=rd.unexpected_parameters_406)
+            lessons = response_cache.cache.set(key, {"group": group_name} | await run_in_threadpool(
+                tools.output_From_DBLesson, db_lessons, dest=lang))
         logging.info("API: get_lessons_by_group | --args: {} | --status: Status_code = 200".format(group_name))
-        return lessons
+        return response_cache.make_response(lessons, if_none_match)
     except (Exception,) as err:
         logging.exception(err)
         logging.info("API: get_lessons_by_group | --args: {} | --status: Status_code = 500".format(group_name))
@@ -61,18 +89,27 @@ async def get_lessons_by_group(group_name: str, lang: str = 'ru', db: Session =
 
 
 @app.get("/all_lessons_by_group_and_day/", response_model=dict)
-async def get_lessons_by_group_day(group_name: str, day: str, lang: str = 'ru', db: Session = Depends(get_db)):
+async def get_lessons_by_group_day(group_name: str, day: str, lang: str = 'ru',
+                                   if_none_match: Union[str, None] = Header(None),
+                                   db: AsyncSession = Depends(get_async_db)):
     try:
         logging.info("API: get_lessons_by_group_day | --args: {}, {} | --status: Get request".format(group_name, day))
-        db_lessons = crud.get_lessons_by_DayAndGroupName(db, group_name, day)
-        if len(db_lessons) == 0:
-            logging.error(
-                "API: get_lessons_by_group_day | --args: {}, {} | --status: Status_code = 406".format(group_name, day))
-            raise HTTPException(status_code=406, detail=rd.unexpected_parameters_406)
-        lessons = {"group": group_name} | tools.output_From_DBLesson(db_lessons, db=db, dest=lang)
+        today = datetime.date.today()
+        key = ("all_lessons_by_group_and_day", await async_crud.get_generation(db, "schedule"), group_name, day, lang,
+               today)
+        lessons = response_cache.cache.get(key)
+        if lessons is None:
+            db_lessons = await async_crud.get_lessons_by_DayAndGroupName(db, group_name, day, active_on=today)
+            if len(db_lessons) == 0 and await async_crud.get_group_by_Name(db, group_name) is None:
+                logging.error(
+                    "API: get_lessons_by_group_day | --args: {}, {} | --status: Status_code = 406".format(group_name,
+                                                                                                         day))
+                raise HTTPException(status_code=406, detail=rd.unexpected_parameters_406)
+            lessons = response_cache.cache.set(key, {"group": group_name} | await run_in_threadpool(
+                tools.output_From_DBLesson, db_lessons, dest=lang))
         logging.info(
             "API: get_lessons_by_group_day | --args: {}, {} | --status: Status_code = 200".format(group_name, day))
-        return lessons
+        return response_cache.make_response(lessons, if_none_match)
     except (Exception,) as err:
         logging.exception(err)
         logging.info(
@@ -81,19 +118,31 @@ async def get_lessons_by_group_day(group_name: str, day: str, lang: str = 'ru',
 
 
 @app.get("/all_lessons_by_teacher/", response_model=dict)
-async def get_lessons_by_teacher(teacher_name: str, lang: str = 'ru', db: Session = Depends(get_db)):
+async def get_lessons_by_teacher(teacher_name: str, lang: str = 'ru', if_none_match: Union[str, None] = Header(None),
+                                 db: AsyncSession = Depends(get_async_db)):
     try:
         logging.info("API: get_lessons_by_teacher | --args: {} | --status: Get request".format(teacher_name))
-        db_lessons = crud.get_lessons_by_TeacherName(db, teacher_name=teacher_name)
-        if len(db_lessons) == 0:
-            logging.error("API: get_lessons_by_teacher | --args: {} | --status: Status_code = 406".format(teacher_name))
-            raise HTTPException(status_code=406, detail=rd.unexpected_parameters_406)
-        res = {"teachers": teacher_name,
-               "tr_teachers": tr.translate(teacher_name, dest=lang),
-               "tr_teachers_fullname": tr.translate(crud.get_teacher_by_Name(db, teacher_name).fullname, dest=lang)} \
-            | tools.output_From_DBLessonT(db_lessons, db=db, dest=lang)
+        today = datetime.date.today()
+        key = ("all_lessons_by_teacher", await async_crud.get_generation(db, "schedule"), teacher_name, lang, today)
+        res = response_cache.cache.get(key)
+        if res is None:
+            db_lessons = await async_crud.get_lessons_by_TeacherName(db, teacher_name=teacher_name, active_on=today)
+            if len(db_lessons) == 0 and await async_crud.get_teacher_by_Name(db, teacher_name) is None:
+                logging.error(
+                    "API: get_lessons_by_teacher | --args: {} | --status: Status_code = 406".format(teacher_name))
+                raise HTTPException(status_code=406, detail=rd.unexpected_parameters_406)
+            tr_teacher_name, tr_teacher_fullname = await run_in_threadpool(
+                tr.translate_many, [teacher_name, (await async_crud.get_teacher_by_Name(db, teacher_name)).fullname],
+                dest=lang)
+            res = response_cache.cache.set(key, {"teachers": teacher_name,
+                                                 "tr_teachers": tr_teacher_name,
+                                                 "tr_teachers_fullname": tr_teacher_fullname}
+                                           | await run_in_threadpool(
+                                               tools.output_From_DBLessonT, db_lessons,
+                                               await async_crud.get_lessons_groups_by_TeacherName(db, teacher_name),
+                                               dest=lang))
         logging.info("API: get_lessons_by_teacher | --args: {} | --status: Status_code = 200".format(teacher_name))
-        return res
+        return response_cache.make_response(res, if_none_match)
     except (Exception,) as err:
         logging.exception(err)
         logging.info("API: get_lessons_by_teacher | --args: {} | --status: Status_code = 500".format(teacher_name))
@@ -101,14 +150,14 @@ async def get_lessons_by_teacher(teacher_name: str, lang: str = 'ru', db: Sessio
 
 
 @app.get("/teacher_info/")
-async def get_teacher_info(teacher_name: str, lang: str = 'ru', db: Session = Depends(get_db)):
+async def get_teacher_info(teacher_name: str, lang: str = 'ru', db: AsyncSession = Depends(get_async_db)):
     try:
         logging.info("API: get_teacher_info | --args: {} | --status: Get request".format(teacher_name))
-        db_teacher = crud.get_teacher_by_Name(db, teacher_name=teacher_name)
+        db_teacher = await async_crud.get_teacher_by_Name(db, teacher_name=teacher_name)
         if db_teacher is None:
             logging.error("API: get_teacher_info | --args: {} | --status: Status_code = 406".format(teacher_name))
             raise HTTPException(status_code=406, detail=rd.unexpected_parameters_406)
-        res = tools.output_From_DBTeacher(db_teacher, dest=lang)
+        res = await run_in_threadpool(tools.output_From_DBTeacher, db_teacher, dest=lang)
         logging.info("API: get_lessons_by_teacher | --args: {} | --status: Status_code = 200".format(teacher_name))
         return res
     except (Exception,) as err:
@@ -118,10 +167,10 @@ async def get_teacher_info(teacher_name: str, lang: str = 'ru', db: Session = De
 
 
 @app.get("/all_groups_by_course/", response_model=dict[str, list[schemas.GroupOutput]])
-async def get_groups_by_course(course: int, db: Session = Depends(get_db)):
+async def get_groups_by_course(course: int, db: AsyncSession = Depends(get_async_db)):
     try:
         logging.info("API: get_groups_by_course | --args: {} | --status: Get request".format(course))
-        db_groups = crud.get_groups_by_Course(db, course=course)
+        db_groups = await async_crud.get_groups_by_Course(db, course=course)
         if len(db_groups) == 0:
             logging.error("API: get_groups_by_course | --args: {} | --status: Status_code = 406".format(course))
             raise HTTPException(status_code=406, detail=rd.unexpected_parameters_406)
@@ -134,10 +183,10 @@ async def get_groups_by_course(course: int, db: Session = Depends(get_db)):
 
 
 @app.get("/all_groups_by_course_acType/", response_model=dict[str, list[schemas.GroupOutput]])
-async def get_groups_by_course_acType(course: int, acType: str, db: Session = Depends(get_db)):
+async def get_groups_by_course_acType(course: int, acType: str, db: AsyncSession = Depends(get_async_db)):
     try:
         logging.info("API: get_groups_by_course_acType | --args: {}, {} | --status: Get request".format(course, acType))
-        db_groups = crud.get_groups_by_CourseAndAcType(db, course=course, acType=acType)
+        db_groups = await async_crud.get_groups_by_CourseAndAcType(db, course=course, acType=acType)
         if len(db_groups) == 0:
             logging.error(
                 "API: get_groups_by_course_acType | --args: {}, {} | --status: Status_code = 406".format(course,
@@ -154,10 +203,10 @@ async def get_groups_by_course_acType(course: int, acType: str, db: Session = De
 
 
 @app.get("/all_groups/")
-async def get_all_groups(db: Session = Depends(get_db)):
+async def get_all_groups(db: AsyncSession = Depends(get_async_db)):
     try:
         logging.info("API: get_all_groups | --status: Get request")
-        db_groups = crud.get_all_groups(db)
+        db_groups = await async_crud.get_all_groups(db)
         if len(db_groups) == 0:
             logging.error("API: get_all_groups | --status: Status_code = 406")
             raise HTTPException(status_code=406, detail=rd.unexpected_parameters_406)
@@ -170,33 +219,120 @@ async def get_all_groups(db: Session = Depends(get_db)):
 
 
 @app.get("/all_teachers/")
-async def get_all_teachers(lang: str = 'ru', db: Session = Depends(get_db)):
+async def get_all_teachers(lang: str = 'ru', if_none_match: Union[str, None] = Header(None),
+                           db: AsyncSession = Depends(get_async_db)):
     try:
         logging.info("API: get_all_teachers | --status: Get request")
-        db_teachers = crud.get_all_teachers(db)
-        if len(db_teachers) == 0:
-            logging.error("API: get_all_teachers | --status: Status_code = 406")
-            raise HTTPException(status_code=406, detail=rd.unexpected_parameters_406)
+        generation = await async_crud.get_generation(db, "teachers")
+        key = ("all_teachers", generation, lang)
+        res = response_cache.cache.get(key)
+        if res is None:
+            # lists are built by input_parse_info.teacher_lists_to_db, other languages on their first request
+            teachers = await async_crud.get_teacher_list(db, lang, generation)
+            if teachers is None:
+                teachers = await async_crud.get_all_teachers(db)
+                if len(teachers) == 0:
+                    logging.error("API: get_all_teachers | --status: Status_code = 406")
+                    raise HTTPException(status_code=406, detail=rd.unexpected_parameters_406)
+                teachers = await run_in_threadpool(tr.translate_many, teachers, dest=lang)
+                await async_crud.save_teacher_list(db, lang, generation, teachers)
+            res = response_cache.cache.set(key, {"teachers": teachers})
         logging.info("API: get_all_teachers | --status: Status_code = 200")
-        db_teachers.sort()
-        return {"teachers": tr.translate(" | ".join(db_teachers), dest=lang).split(" | ")}
+        return response_cache.make_response(res, if_none_match)
     except (Exception,) as err:
         logging.exception(err)
         logging.info("API: get_all_teachers | --status: Status_code = 500")
         raise HTTPException(status_code=500, detail=rd.server_error_500)
 
 
+@app.get("/schedule/snapshot/")
+async def get_schedule_snapshot(if_none_match: Union[str, None] = Header(None),
+                                db: AsyncSession = Depends(get_async_db)):
+    try:
+        logging.info("API: get_schedule_snapshot | --status: Get request")
+        res = await snapshot.cache.get(db)
+        if res is None:
+            # no snapshot for this generation yet (import made by an older version), build it once
+            await run_in_threadpool(build_snapshot)
+            res = await snapshot.cache.get(db)
+            if res is None:
+                logging.error("API: get_schedule_snapshot | --status: Status_code = 406")
+                raise HTTPException(status_code=406, detail=rd.unexpected_parameters_406)
+        logging.info("API: get_schedule_snapshot | --status: Status_code = 200")
+        # a gzip file of its own, not a Content-Encoding: clients unpack it whatever their Accept-Encoding
+        return response_cache.make_response(res, if_none_match, media_type="application/x-msgpack+gzip")
+    except (Exception,) as err:
+        logging.exception(err)
+        logging.info("API: get_schedule_snapshot | --status: Status_code = 500")
+        raise HTTPException(status_code=500, detail=rd.server_error_500)
+
+
+@app.get("/schedule/changes/")
+async def get_schedule_changes(since: int = 0, group: Union[str, None] = None, limit: int = 1000,
+                               db: AsyncSession = Depends(get_async_db)):
+    try:
+        logging.info("API: get_schedule_changes | --args: {}, {}, {} | --status: Get request".format(since, group, limit))
+        first, last = await async_crud.get_schedule_changes_range(db)
+        if first is None or since < first - 1 or since > last:
+            # the changes after since were pruned (or the log was reset): start again from /schedule/snapshot/
+            logging.info("API: get_schedule_changes | --args: {}, {}, {} | --status: Status_code = 200"
+                         .format(since, group, limit))
+            return {"version": 0 if last is None else last, "reset": since != 0 or first is not None,
+                    "has_more": False, "changes": []}
+        limit = max(1, min(limit, SCHEDULE_CHANGES_MAX_LIMIT))
+        db_changes = await async_crud.get_schedule_changes(db, since, group, limit)
+        has_more = len(db_changes) == limit
+        logging.info("API: get_schedule_changes | --args: {}, {}, {} | --status: Status_code = 200"
+                     .format(since, group, limit))
+        # the next request goes on from version, with a group filter it may be past the last returned change
+        return {"version": db_changes[-1].version if has_more else last, "reset": False, "has_more": has_more,
+                "changes": [schemas.ScheduleChangeOutput(item=item) for item in db_changes]}
+    except (Exception,) as err:
+        logging.exception(err)
+        logging.info("API: get_schedule_changes | --args: {}, {}, {} | --status: Status_code = 500"
+                     .format(since, group, limit))
+        raise HTTPException(status_code=500, detail=rd.server_error_500)
+
+
+def build_snapshot():
+    db = SessionLocal()
+    try:
+        return snapshot.save_snapshot(db, only_missing=True)
+    finally:
+        db.close()
+
+
+@app.get("/search/")
+async def search(q: str, limit: int = 10, db: AsyncSession = Depends(get_async_db)):
+    try:
+        logging.info("API: search | --args: {}, {} | --status: Get request".format(q, limit))
+        query = q.strip()
+        if len(query) == 0:
+            logging.error("API: search | --args: {}, {} | --status: Status_code = 406".format(q, limit))
+            raise HTTPException(status_code=406, detail=rd.unexpected_parameters_406)
+        limit = min(max(limit, 1), SEARCH_MAX_LIMIT)
+        teachers = await async_crud.search_teachers(db, query, limit)
+        groups = await async_crud.search_groups(db, query, limit)
+        logging.info("API: search | --args: {}, {} | --status: Status_code = 200".format(q, limit))
+        return {"teachers": [{"name": name, "fullname": fullname} for name, fullname in teachers],
+                "groups": groups}
+    except (Exception,) as err:
+        logging.exception(err)
+        logging.info("API: search | --args: {}, {} | --status: Status_code = 500".format(q, limit))
+        raise HTTPException(status_code=500, detail=rd.server_error_500)
+
+
 @app.get("/news_preview_by_id/")
-async def get_news_preview_by_id(_id_: int, db: Session = Depends(get_db)):
+async def get_news_preview_by_id(_id_: int, db: AsyncSession = Depends(get_async_db)):
     try:
         logging.info("API: get_news_preview_by_id | --args: {} | --status: Get request".format(_id_))
-        db_news = crud.get_news_by_Id(db, input_parse_info.idInverter(_id_))
+        news_id = await news_index.index.get_id(db, _id_)
+        db_news = await async_crud.get_news_by_Id(db, news_id) if news_id is not None else None
         if db_news is None:
             logging.error("API: get_news_preview_by_id | --args: {} | --status: Status_code = 406".format(_id_))
             raise HTTPException(status_code=406, detail=rd.unexpected_parameters_406)
         logging.info("API: get_news_preview_by_id | --args: {} | --status: Status_code = 200".format(_id_))
-        with open(db_news.pathToPreview, 'r', encoding='utf-8') as fp:
-            return json.load(fp=fp)
+        return schemas.NewsPreviewOutput(item=db_news)
     except (Exception,) as err:
         logging.exception(err)
         logging.info("API: get_news_preview_by_id | --args: {} | --status: Status_code = 500".format(_id_))
@@ -204,14 +340,14 @@ async def get_news_preview_by_id(_id_: int, db: Session = Depends(get_db)):
 
 
 @app.get("/news_previews_by_id/")
-async def get_news_previews_by_id(start: int, end: int, db: Session = Depends(get_db)):
+async def get_news_previews_by_id(start: int, end: int, db: AsyncSession = Depends(get_async_db)):
     try:
         logging.info("API: get_news_previews_by_id | --args: {}, {} | --status: Get request".format(start, end))
         db_news = {"news": []}
-        for _id_ in range(start, end):
-            with open(crud.get_news_by_Id(db, input_parse_info.idInverter(_id_)).pathToPreview, 'r',
-                      encoding='utf-8') as fp:
-                db_news["news"].append(json.load(fp=fp))
+        news_ids = await news_index.index.get_ids(db, start, end)
+        if len(news_ids) != 0:
+            db_news["news"] = [schemas.NewsPreviewOutput(item=item)
+                               for item in await async_crud.get_news_by_Ids(db, news_ids)]
         if len(db_news["news"]) == 0:
             logging.error(
                 "API: get_news_previews_by_id | --args: {}, {} | --status: Status_code = 406".format(start, end))
@@ -225,57 +361,118 @@ async def get_news_previews_by_id(start: int, end: int, db: Session = Depends(ge
 
 
 @app.get("/news_page_by_id/")
-async def get_news_page_by_id(_id_: int, db: Session = Depends(get_db)):
+async def get_news_page_by_id(_id_: int, db: AsyncSession = Depends(get_async_db)):
     try:
         logging.info("API: get_news_page_by_id | --args: {} | --status: Get request".format(_id_))
-        db_news = crud.get_news_by_Id(db, input_parse_info.idInverter(_id_))
+        news_id = await news_index.index.get_id(db, _id_)
+        db_news = await async_crud.get_news_by_Id(db, news_id) if news_id is not None else None
         if db_news is None:
             logging.error("API: get_news_page_by_id | --args: {} | --status: Status_code = 406".format(_id_))
             raise HTTPException(status_code=406, detail=rd.unexpected_parameters_406)
         logging.info("API: get_news_page_by_id | --args: {} | --status: Status_code = 200".format(_id_))
-        with open(db_news.pathToNews, 'r', encoding='utf-8') as fp:
-            return json.load(fp=fp)
+        return schemas.NewsPageOutput(item=db_news)
     except (Exception,) as err:
         logging.exception(err)
         logging.info("API: get_news_page_by_id | --args: {} | --status: Status_code = 500".format(_id_))
         raise HTTPException(status_code=500, detail=rd.server_error_500)
 
 
-@app.get("/parsing_schedule/")
-def parsing_schedule(schedule: bool = True, teacher: bool = True):
+@app.get("/news_feed/")
+async def get_news_feed(before_id: Union[int, None] = None, limit: int = 20, category: Union[str, None] = None,
+                        if_none_match: Union[str, None] = Header(None), db: AsyncSession = Depends(get_async_db)):
     try:
-        logging.info(
-            "API: parsing_schedule | --args: {}, {} | --status: Start parsing schedule".format(schedule, teacher))
-        if schedule:
-            sp.parse_schedule()
-        if teacher:
-            sp.parse_teachers_fullname()
-        logging.info(
-            "API: parsing_schedule | --args: {}, {} | --status: Successful parsing schedule".format(schedule, teacher))
+        logging.info("API: get_news_feed | --args: {}, {}, {} | --status: Get request"
+                     .format(before_id, limit, category))
+        limit = min(max(limit, 1), NEWS_FEED_MAX_LIMIT)
+        key = ("news_feed", await async_crud.get_generation(db, "news"), before_id, limit, category)
+        res = response_cache.cache.get(key)
+        if res is None:
+            db_news = await async_crud.get_news_feed(db, before_id, limit, category)
+            res = response_cache.cache.set(key, {
+                "news": [schemas.NewsFeedOutput(item=item) for item in db_news],
+                # before_id of the next page, None on the last one
+                "next_before_id": db_news[-1].id if len(db_news) == limit else None})
+        logging.info("API: get_news_feed | --args: {}, {}, {} | --status: Status_code = 200"
+                     .format(before_id, limit, category))
+        return response_cache.make_response(res, if_none_match)
     except (Exception,) as err:
         logging.exception(err)
-        logging.info("API: parsing_schedule | --args: {}, {} | --status: Status_code = 500".format(schedule, teacher))
+        logging.info("API: get_news_feed | --args: {}, {}, {} | --status: Status_code = 500"
+                     .format(before_id, limit, category))
         raise HTTPException(status_code=500, detail=rd.server_error_500)
 
 
-@app.get("/fill_db/")
-def fill_db(schedule: bool = True, news: bool = True, teacher_fullname: bool = True, db: Session = Depends(get_db)):
+def parsing_schedule_job(job: jobs.Job, schedule: bool, teacher: bool):
+    logging.info("API: parsing_schedule | --args: {}, {} | --status: Start parsing schedule".format(schedule, teacher))
+    res = {}
+    if schedule:
+        job.progress = "schedule"
+        res["changed_groups"] = len(sp.parse_schedule())
+        logging.info("API: parsing_schedule | --status: Changed groups: {}".format(res["changed_groups"]))
+    if teacher:
+        job.progress = "teachers fullname"
+        sp.parse_teachers_fullname()
+    logging.info("API: parsing_schedule | --args: {}, {} | --status: Successful parsing schedule".format(schedule, teacher))
+    return res
+
+
+def fill_db_job(job: jobs.Job, schedule: bool, news: bool, teacher_fullname: bool, changed_only: bool):
+    # the request session is closed when the handler returns, the job opens its own one
+    db = SessionLocal()
     try:
         logging.info("API: fill_db | --args: {}, {}, {} | --status: Start filling db"
                      .format(schedule, news, teacher_fullname))
+        res = {}
         if schedule:
-            input_parse_info.schedule_info_to_db(db)
-            logging.info("API: fill_db | --args: {}, {}, {} | --status: Successful filling schedule"
-                         .format(schedule, news, teacher_fullname))
+            job.progress = "schedule"
+            res["schedule"] = input_parse_info.schedule_info_to_db(db, changed_only=changed_only)
+            logging.info("API: fill_db | --args: {}, {}, {} | --status: Successful filling schedule | --stats: {}"
+                         .format(schedule, news, teacher_fullname, res["schedule"]))
         if news:
-            input_parse_info.news_info_to_db(db)
-            logging.info("API: fill_db | --args: {}, {}, {} | --status: Successful filling news"
-                         .format(schedule, news, teacher_fullname))
+            job.progress = "news"
+            res["news"] = input_parse_info.news_info_to_db(db)
+            logging.info("API: fill_db | --args: {}, {}, {} | --status: Successful filling news, new news: {}"
+                         .format(schedule, news, teacher_fullname, res["news"]))
         if teacher_fullname:
-            input_parse_info.teachers_fullname_to_db(db)
-            logging.info("API: fill_db | --args: {}, {}, {} | --status: Successful filling teachers fullname"
-                         .format(schedule, news, teacher_fullname))
+            job.progress = "teachers fullname"
+            res["teachers_fullname"] = input_parse_info.teachers_fullname_to_db(db)
+            logging.info("API: fill_db | --args: {}, {}, {} | --status: Successful filling teachers fullname | "
+                         "--stats: {}".format(schedule, news, teacher_fullname, res["teachers_fullname"]))
         logging.info("API: fill_db | --status: Successful filling db")
+        return res
+    finally:
+        db.close()
+
+
+def parsing_news_job(job: jobs.Job, incremental: bool):
+    logging.info("API: parsing_news | --args: {} | --status: Start parsing news".format(incremental))
+    job.progress = "news"
+    res = np.parse(incremental)
+    logging.info("API: parsing_news | --args: {} | --status: Successful parsing news, new news: {}"
+                 .format(incremental, res))
+    return res
+
+
+@app.get("/parsing_schedule/")
+def parsing_schedule(schedule: bool = True, teacher: bool = True):
+    try:
+        job = jobs.runner.submit("parsing_schedule", parsing_schedule_job, schedule, teacher)
+        logging.info("API: parsing_schedule | --args: {}, {} | --status: Job {} {}"
+                     .format(schedule, teacher, job.id, job.status))
+        return job.info()
+    except (Exception,) as err:
+        logging.exception(err)
+        logging.info("API: parsing_schedule | --args: {}, {} | --status: Status_code = 500".format(schedule, teacher))
+        raise HTTPException(status_code=500, detail=rd.server_error_500)
+
+
+@app.get("/fill_db/")
+def fill_db(schedule: bool = True, news: bool = True, teacher_fullname: bool = True, changed_only: bool = True):
+    try:
+        job = jobs.runner.submit("fill_db", fill_db_job, schedule, news, teacher_fullname, changed_only)
+        logging.info("API: fill_db | --args: {}, {}, {} | --status: Job {} {}"
+                     .format(schedule, news, teacher_fullname, job.id, job.status))
+        return job.info()
     except (Exception,) as err:
         logging.exception(err)
         logging.info("API: fill_db | --status: Status_code = 500")
@@ -283,12 +480,26 @@ def fill_db(schedule: bool = True, news: bool = True, teacher_fullname: bool = T
 
 
 @app.get("/parsing_news/")
-async def parsing_news():
+def parsing_news(incremental: bool = True):
     try:
-        logging.info("API: parsing_news | --status: Start parsing news")
-        np.parse()
-        logging.info("API: parsing_news | --status: Successful parsing news")
+        job = jobs.runner.submit("parsing_news", parsing_news_job, incremental)
+        logging.info("API: parsing_news | --args: {} | --status: Job {} {}".format(incremental, job.id, job.status))
+        return job.info()
     except (Exception,) as err:
         logging.exception(err)
         logging.info("API: parsing_news | --status: Status_code = 500")
         raise HTTPException(status_code=500, detail=rd.server_error_500)
+
+
+@app.get("/jobs/")
+def get_jobs():
+    return {"jobs": [job.info() for job in jobs.runner.list()]}
+
+
+@app.get("/jobs/{job_id}/")
+def get_job(job_id: str):
+    job = jobs.runner.get(job_id)
+    if job is None:
+        logging.error("API: get_job | --args: {} | --status: Status_code = 406".format(job_id))
+        raise HTTPException(status_code=406, detail=rd.unexpected_parameters_406)
+    return job.info()
@@ -1,7 +1,10 @@
+import os
+
+
 class Settings:
-    URL_ALL_SCHEDULE = "https://home.mephi.ru/study_groups/"
-    URL_TEACHERS_SCHEDULE = "https://home.mephi.ru/tutors"
-    URL_HOME_MEPHI = "https://home.mephi.ru"
+    URL_HOME_MEPHI = os.environ.get("HOME_MEPHI_URL", "https://home.mephi.ru")
+    URL_ALL_SCHEDULE = os.environ.get("MEPHI_SCHEDULE_URL", URL_HOME_MEPHI + "/study_groups/")
+    URL_TEACHERS_SCHEDULE = URL_HOME_MEPHI + "/tutors"
     NEWS_URL = "https://mephi.ru/press/news"
     HOST_URL = "https://mephi.ru"
     NEWS_CAT_URLS = {
@@ -11,10 +14,20 @@ class Settings:
         "workday": NEWS_URL + "?category=1810",
     }
     TEACHERS_FULLNAME_PATH = "FastAPI_SQLAlchemy/parsing/schedule/TeachersFullname.json"
+    SCHEDULE_DIR = "FastAPI_SQLAlchemy/parsing/schedule/"
+    # per-url ETag / Last-Modified / content hash of the last crawl
+    CRAWL_STATE_PATH = "FastAPI_SQLAlchemy/parsing/schedule/crawl_state.json"
+    # groups changed by crawls that were not imported into the db yet
+    CHANGED_GROUPS_PATH = "FastAPI_SQLAlchemy/parsing/schedule/changed_groups.json"
     PREVIEW_DIR = "FastAPI_SQLAlchemy/parsing/preview/"
     NEWS_DIR = "FastAPI_SQLAlchemy/parsing/news/"
+    # per category list of the stored news urls, kept next to the news files
+    NEWS_INDEX_NAME = "index.json"
     BUFFER_1 = 'buffer_1'
     BUFFER_2 = 'buffer_2'
+    # crawler limits: parallel requests and requests per second to one host
+    CRAWL_CONCURRENCY = int(os.environ.get("CRAWL_CONCURRENCY", 8))
+    CRAWL_RATE_LIMIT = float(os.environ.get("CRAWL_RATE_LIMIT", 10))
 
 
 settings = Settings()
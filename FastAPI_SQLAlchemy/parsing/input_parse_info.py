@@ -1,130 +1,122 @@
 from sqlalchemy.orm import Session
 from FastAPI_SQLAlchemy._fastapi_.db import schemas, models
 from FastAPI_SQLAlchemy._fastapi_ import crud
+from FastAPI_SQLAlchemy._fastapi_ import snapshot
 from FastAPI_SQLAlchemy.parsing import schedule_parser as sp
+from FastAPI_SQLAlchemy.parsing import schedule_import as si
+from FastAPI_SQLAlchemy.parsing import news_parser as np
 from FastAPI_SQLAlchemy.parsing.config import settings
+from FastAPI_SQLAlchemy.config import settings as app_settings
+from FastAPI_SQLAlchemy.translator import translator as tr
 
-import json
+import datetime
 import os
 
 DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday"]
 AC_TYPES = ["Бакалавриат", "Специалитет", "Магистратура", "Аспирантура", "ПФ"]
 
 
-def schedule_info_to_db(db: Session):
-    types = sp.getAcademicTypes()
-    for ac_type in types:
-        filename = "FastAPI_SQLAlchemy/parsing/schedule/" + ac_type + ".json"
-        if os.path.exists(filename):
-            with open(filename, "r", encoding='utf-8') as fp:
-                print("Filename: " + filename)
-                dict_json = json.loads(fp.read().replace("'", '"'))
-                for course in dict_json["courses"]:
-                    print("   course: " + course["name"])
-                    for group in course["groups"]:
-                        print("      group: " + group["name"])
-                        db_group = schemas.GroupCreate
-                        db_group.course = course["name"]
-                        db_group.name = group["name"]
-                        db_group.academic_name = ac_type
-
-                        if not crud.get_group_by_Name(db, db_group.name):
-                            crud.create_group(db, db_group)
-
-                        for day in group["lessons"]:
-                            for lessons in group["lessons"][day]:
-                                for lesson in lessons["lessons"]:
-                                    db_lesson = schemas.LessonCreate
-                                    db_lesson.time_start = lessons["time_start"]
-                                    db_lesson.time_end = lessons["time_end"]
-                                    db_lesson.dot = lesson["dot"]
-                                    db_lesson.cabinet = lesson["cabinet"]
-                                    db_lesson.type = lesson["lesson_type"]
-                                    db_lesson.weeks = lesson["weeks"]
-                                    db_lesson.name = lesson["lesson_name"]
-                                    db_lesson.subgroup = lesson["subgroup"]
-                                    db_lesson.date_start = lesson["date_start"]
-                                    db_lesson.date_end = lesson["date_end"]
-                                    db_lesson.group_name = group["name"]
-                                    db_lesson.day = day
-
-                                    if crud.get_lesson(db, time_start=db_lesson.time_start,
-                                                       time_end=db_lesson.time_end,
-                                                       weeks=db_lesson.weeks,
-                                                       date_start=db_lesson.date_start,
-                                                       date_end=db_lesson.date_end,
-                                                       day=db_lesson.day,
-                                                       group_name=db_lesson.group_name,
-                                                       name=db_lesson.name) is None:
-                                        crud.create_lesson(db, db_lesson)
-                                    else:
-                                        crud.update_lesson(db=db,
-                                                           time_start=db_lesson.time_start,
-                                                           time_end=db_lesson.time_end,
-                                                           dot=db_lesson.dot,
-                                                           cabinet=db_lesson.cabinet,
-                                                           type_=db_lesson.type,
-                                                           weeks=db_lesson.weeks,
-                                                           name=db_lesson.name,
-                                                           subgroup=db_lesson.subgroup,
-                                                           date_start=db_lesson.date_start,
-                                                           date_end=db_lesson.date_end,
-                                                           group_name=db_lesson.group_name,
-                                                           day=db_lesson.day)
-
-                                    for teacher_name in lesson["teacher_name"]:
-                                        db_teacher = schemas.TeacherCreate(teacher_name, "", "", "")
-                                        if db_teacher.name is not None:
-                                            if crud.get_teacher_by_Name(db, db_teacher.name) is None:
-                                                crud.create_teacher(db, db_teacher)
-
-                                        db_lesson_teacher = schemas.LessonTeacherCreate
-                                        db_lesson_teacher.teacher_id = crud.get_teacher_by_Name(db, teacher_name=teacher_name).id
-                                        db_lesson_teacher.lesson_id = crud.get_lesson(db,
-                                                                                      time_start=db_lesson.time_start,
-                                                                                      time_end=db_lesson.time_end,
-                                                                                      weeks=db_lesson.weeks,
-                                                                                      date_start=db_lesson.date_start,
-                                                                                      date_end=db_lesson.date_end,
-                                                                                      day=db_lesson.day,
-                                                                                      group_name=db_lesson.group_name,
-                                                                                      name=db_lesson.name).id
-
-                                        if crud.get_lesson_teacher(db, lesson_id=db_lesson_teacher.lesson_id,
-                                                                   teacher_id=db_lesson_teacher.teacher_id) is None:
-                                            crud.create_lesson_teacher(db, db_lesson_teacher)
+def schedule_info_to_db(db: Session, changed_only: bool = True):
+    # without a changed groups list (no incremental crawl yet) every group is imported;
+    # a crawl started meanwhile waits, so its changes are neither read half-written nor lost
+    with sp.schedule_files_lock:
+        only_groups = None
+        if changed_only and os.path.exists(settings.CHANGED_GROUPS_PATH):
+            only_groups = set(sp.loadJson(settings.CHANGED_GROUPS_PATH, {"groups": []})["groups"])
+            print("Changed groups: {}".format(len(only_groups)))
+
+        def records():
+            for ac_type in sp.getAcademicTypes():
+                filename = settings.SCHEDULE_DIR + ac_type + ".jsonl"
+                if os.path.exists(filename):
+                    print("Filename: " + filename)
+                    yield from sp.iterJsonLines(filename)
+
+        stats = si.import_schedule(db, records(), only_groups, keep_changes=app_settings.schedule_changes_keep)
+        print("Schedule import: {}".format(stats))
+        if only_groups is not None:
+            sp.updateChangedGroups(imported=only_groups)
+    crud.bump_generation(db, "schedule")
+    print("Schedule snapshot: {}".format(snapshot.save_snapshot(db)))
+    if stats["teachers"]["inserted"] != 0 or crud.get_generation(db, "teachers") == 0:
+        teacher_lists_to_db(db)
+    return stats
+
+
+def teacher_lists_to_db(db: Session):
+    # the teacher roster changed: new generation and the translated lists of the usual languages
+    generation = crud.bump_generation(db, "teachers")
+    names = crud.get_all_teachers(db)
+    for lang in app_settings.teacher_list_langs:
+        crud.save_teacher_list(db, lang, generation, tr.translate_many(names, dest=lang))
+    return generation
 
 
 def teachers_fullname_to_db(db: Session):
-    if os.path.exists(settings.TEACHERS_FULLNAME_PATH):
-        with open(settings.TEACHERS_FULLNAME_PATH, mode='r', encoding='utf-8') as fp:
-            dict_json = json.load(fp)
-            for fullname in dict_json['teachers_fullname']:
-                buffer = fullname.split()
-                if len(buffer) == 2:
-                    shortname = buffer[0] + " " + buffer[1][0] + "."
-                else:
-                    shortname = buffer[0] + " " + buffer[1][0] + "." + buffer[2][0] + "."
-                crud.update_teacher(db, old_shortname=shortname, fullname=fullname)
+    if not os.path.exists(settings.TEACHERS_FULLNAME_PATH):
+        return None
+    fullnames = sp.loadJson(settings.TEACHERS_FULLNAME_PATH, {"teachers_fullname": []})["teachers_fullname"]
+    res = si.import_teacher_fullnames(db, fullnames)
+    print("Teachers fullname: updated {}, unmatched {}, ambiguous {}"
+          .format(res["updated"], len(res["unmatched"]), len(res["ambiguous"])))
+    if res["updated"] != 0:
+        # cached teacher schedules and the snapshot carry the fullname
+        crud.bump_generation(db, "schedule")
+        print("Schedule snapshot: {}".format(snapshot.save_snapshot(db)))
+    return res
+
+
+def news_date(date: str):
+    try:
+        return datetime.datetime.strptime(date.strip(), "%d.%m.%Y").date()
+    except (ValueError, AttributeError):
+        return datetime.date.min
 
 
 def news_info_to_db(db: Session):
-    preview = os.listdir(PREVIEW_DIR)
-    news = os.listdir(NEWS_DIR)
-    for i in range(len(news), 0, -1):
-        if crud.get_news(db, pathToPreview=PREVIEW_DIR + str(i) + ".json",
-                         pathToNews=NEWS_DIR + str(i) + ".json") is None:
-            db_news = schemas.NewsCreate
-            db_news.pathToPreview = PREVIEW_DIR + str(i) + ".json"
-            db_news.pathToNews = NEWS_DIR + str(i) + ".json"
-            crud.create_news(db, db_news)
-    diff = len(preview) - len(news)
-    if diff > 0:
-        for i in range(len(preview), len(preview) - diff, -1):
-            os.remove(PREVIEW_DIR + str(i) + ".json")
-
-
-def idInverter(_id_: int):
-    news = os.listdir(NEWS_DIR)
-    print("_id_ = {}\nnew _id_ = {}".format(_id_, len(news) - _id_ + 1))
-    return len(news) - _id_ + 1
+    news_files_to_db(db)
+
+    stored = crud.get_news_urls(db)
+    new_news = []
+    # a news crawl started meanwhile waits, the index and the files it lists are read as one state
+    with np.news_files_lock:
+        for category in settings.NEWS_CAT_URLS:
+            preview_dir = settings.PREVIEW_DIR + category + "/"
+            news_dir = settings.NEWS_DIR + category + "/"
+            urls = sp.loadJson(news_dir + settings.NEWS_INDEX_NAME, {"urls": []})["urls"]
+            for i, url in enumerate(urls, start=1):
+                if url in stored:
+                    continue
+                stored.add(url)
+                preview = sp.loadJson(preview_dir + str(i) + ".json", {})
+                news = sp.loadJson(news_dir + str(i) + ".json", {})
+                new_news.append(schemas.NewsCreate(url=url, category=category,
+                                                   img_url=preview.get("img_url"),
+                                                   preview_date=preview.get("date"),
+                                                   preview_text=preview.get("text"),
+                                                   title=news.get("title"),
+                                                   date=news.get("date"),
+                                                   text=news.get("text"),
+                                                   images_url=news.get("images_url")))
+
+    # every category is already ordered from the oldest news, the stable sort merges them by date
+    new_news.sort(key=lambda item: news_date(item.preview_date))
+    print("New news: {}".format(len(new_news)))
+    res = crud.create_news_many(db, new_news)
+    crud.bump_generation(db, "news")
+    return res
+
+
+def news_files_to_db(db: Session):
+    # moves the news stored as pathToPreview / pathToNews files into the news columns
+    for db_news in crud.get_news_without_text(db):
+        preview = sp.loadJson(db_news.pathToPreview, {}) if db_news.pathToPreview is not None else {}
+        news = sp.loadJson(db_news.pathToNews, {})
+        db_news.img_url = preview.get("img_url")
+        db_news.preview_date = preview.get("date")
+        db_news.preview_text = preview.get("text")
+        db_news.title = news.get("title")
+        db_news.date = news.get("date")
+        db_news.text = news.get("text", "")
+        db_news.images_url = news.get("images_url", [])
+    db.commit()
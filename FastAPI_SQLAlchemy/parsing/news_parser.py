@@ -1,52 +1,52 @@
-import requests
 from lxml import etree
+import itertools
 import json
 import os
 import re
+import threading
 import html2text
 
 from .config import settings
 import FastAPI_SQLAlchemy.parsing.schedule_parser as sp
 
-
-def get_urlNews(url):
-    text = sp.getText(url)
-    tree = etree.HTML(text)
-    container = tree.xpath("//div[@class='view-content']")[0]
-    res_urlNews = []
-    for element in container:
-        res_urlNews.append(settings.HOST_URL + element[0][0][0].attrib['href'])
-    if len(tree.xpath("//li[@class='pager-next']")) != 0:
-        return res_urlNews + get_urlNews(settings.HOST_URL + tree.xpath("//li[@class='pager-next']")[0][0].attrib['href'])
-    else:
-        return res_urlNews
-
-
-def get_urlPages(url):
-    text = sp.getText(url)
-    tree = etree.HTML(text)
-    res_urlPages = [url]
-    if len(tree.xpath("//li[@class='pager-next']")) != 0:
-        return res_urlPages + get_urlPages(settings.HOST_URL + tree.xpath("//li[@class='pager-next']")[0][0].attrib['href'])
-    else:
-        return res_urlPages
+# the crawl (parse_category) and the import (input_parse_info.news_info_to_db) run as different jobs,
+# both hold this lock while they use the news files and the index.json of the categories
+news_files_lock = threading.RLock()
 
 
-def parse_preview(url):
-    text = sp.getText(url)
+def parse_listing(text):
+    # one listing page -> (previews with the url of their article, url of the next listing page or None)
     tree = etree.HTML(text)
     container = tree.xpath("//div[@class='view-content']")[0]
     res = []
     for element in container:
-        res.append({"img_url": element.xpath(".//img")[0].xpath(".//@src")[0],
+        res.append({"url": settings.HOST_URL + element[0][0][0].attrib['href'],
+                    "img_url": element.xpath(".//img")[0].xpath(".//@src")[0],
                     "date": element.xpath(".//span[@class='date-display-single']")[0].text,
                     "text": element.xpath(".//a")[1].text
                     })
-    return res
+    pager_next = tree.xpath("//li[@class='pager-next']")
+    if len(pager_next) != 0:
+        return res, settings.HOST_URL + pager_next[0][0].attrib['href']
+    return res, None
+
+
+def iter_previews(url):
+    # follows pager-next iteratively, every listing page is fetched once;
+    # a page that can not be parsed raises IndexError, the previews after it are unknown
+    page = 1
+    while url is not None:
+        print("current page: {}".format(page))
+        previews, url = parse_listing(sp.getText(url))
+        yield from previews
+        page += 1
 
 
 def parse_WebPage(url):
-    text = sp.getText(url)
+    return parse_article(sp.getText(url))
+
+
+def parse_article(text):
     tree = etree.HTML(text)
     res = {"title": tree.xpath("//h1[@id='page-title']")[0].text}
     container = tree.xpath("//div[@class='node node-news clearfix']")[0]
@@ -82,63 +82,63 @@ def parse_WebPage(url):
     return res
 
 
-def parse_previews(URLs, pathToWrite):
-    i = 1
-    j = 1
+def fetch_news(preview):
     try:
-        print("- Start parsing previews -")
-        for page_url in URLs:
-            print("current page: {}".format(j))
-            res = parse_preview(page_url)
-            for preview in res:
-                with open(pathToWrite + str(j) + ".json", 'w', encoding='utf-8') as fp:
-                    json.dump(preview, fp=fp, ensure_ascii=False, indent=3)
-                    j += 1
-            i += 1
+        return preview, parse_WebPage(preview["url"])
     except IndexError as err:
-        print(err)
-
-        if os.path.exists(pathToWrite + str(i) + ".json"):
-            os.remove(pathToWrite + str(i) + ".json")
-        i -= 1
-        print("-!!! An exception occurred !!!-")
-
-    print("- Pages were parsed: {} -".format(i))
-    print("- Previews were parsed: {} -".format(j))
-    print("- Successful parsing -\n")
-
-
-def parse_news(URLs, pathToWrite):
-    i = 1
-    try:
-        print("- Start parsing pages -")
-        for page_url in URLs:
-            print("   current page: {}".format(i))
-            with open(pathToWrite + str(i) + ".json", 'w', encoding='utf-8') as fp:
-                json.dump(parse_WebPage(page_url), fp=fp, ensure_ascii=False, indent=3)
-                i += 1
-    except IndexError as err:
-        print(err)
-
-        if os.path.exists(pathToWrite + str(i) + ".json"):
-            os.remove(pathToWrite + str(i) + ".json")
-        i -= 1
-        print("-!!! An exception occurred !!!-")
-
-    print("- News were parsed: {} -".format(i))
-    print("- Successful parsing -\n")
-
-
-def parse_category(category: tuple):
-    if not os.path.exists("./FastAPI_SQLAlchemy/parsing/news/" + str(category[0])):
-        os.makedirs("./FastAPI_SQLAlchemy/parsing/news/" + str(category[0]))
-    if not os.path.exists("./FastAPI_SQLAlchemy/parsing/preview/" + str(category[0])):
-        os.makedirs("./FastAPI_SQLAlchemy/parsing/preview/" + str(category[0]))
-    parse_previews(get_urlPages(category[1]), "./FastAPI_SQLAlchemy/parsing/preview/{}/".format(category[0]))
-    parse_news(get_urlNews(category[1]), "./FastAPI_SQLAlchemy/parsing/news/{}/".format(category[0]))
-
-
-def parse():
+        print("{}: {}".format(preview["url"], err))
+        return preview, None
+
+
+def parse_category(category: tuple, incremental: bool = True):
+    preview_dir = settings.PREVIEW_DIR + category[0] + "/"
+    news_dir = settings.NEWS_DIR + category[0] + "/"
+    if not os.path.exists(news_dir):
+        os.makedirs(news_dir)
+    if not os.path.exists(preview_dir):
+        os.makedirs(preview_dir)
+
+    with news_files_lock:
+        # urls of the stored news, the news with id i is urls[i - 1] (the oldest one has id 1)
+        index_path = news_dir + settings.NEWS_INDEX_NAME
+        urls = sp.loadJson(index_path, {"urls": []})["urls"] if incremental else []
+        known = set(urls)
+
+        # listing pages go from the newest news to the oldest, so paging stops at the first stored one;
+        # articles are downloaded by the crawler pool while the next listing pages are still being read
+        previews = itertools.takewhile(lambda preview: preview["url"] not in known, iter_previews(category[1]))
+        try:
+            new_news = list(sp.fetchIter(fetch_news, previews))
+        except IndexError as err:
+            # a listing page failed: the news on it are older than the ones read, storing those would hide them
+            # from the next crawl, so nothing is stored and the next crawl reads the listing again
+            print(err)
+            print("-!!! An exception occurred !!!-")
+            return 0
+        # the next crawl stops at the newest stored news: an article that failed to download is only fetched
+        # again if nothing newer than it is stored, so the news from the newest failure on wait for the next crawl
+        failed = [i for i, (_, news) in enumerate(new_news) if news is None]
+        if len(failed) != 0:
+            print("- News left for the next crawl: {} -".format(failed[-1] + 1))
+            new_news = new_news[failed[-1] + 1:]
+
+        for preview, news in reversed(new_news):
+            urls.append(preview["url"])
+            with open(preview_dir + str(len(urls)) + ".json", 'w', encoding='utf-8') as fp:
+                json.dump({key: preview[key] for key in ["img_url", "date", "text"]}, fp=fp, ensure_ascii=False,
+                          indent=3)
+            with open(news_dir + str(len(urls)) + ".json", 'w', encoding='utf-8') as fp:
+                json.dump(news, fp=fp, ensure_ascii=False, indent=3)
+        sp.dumpJson(index_path, {"urls": urls})
+
+        print("- News were parsed: {} -".format(len(new_news)))
+        print("- Successful parsing -\n")
+        return len(new_news)
+
+
+def parse(incremental: bool = True):
+    res = {}
     for category in settings.NEWS_CAT_URLS.items():
         print("- Parse category: {} -".format(category[0]))
-        parse_category(category)
+        res[category[0]] = parse_category(category, incremental)
+    return res
@@ -0,0 +1,292 @@
+from sqlalchemy import delete, tuple_, update, values, column, func, String
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from FastAPI_SQLAlchemy._fastapi_.db import models
+
+import time
+
+BATCH_SIZE = 1000
+GROUP_BATCH_SIZE = 100
+LESSON_FIELDS = ["dot", "cabinet", "type", "subgroup"]
+
+
+def batches(items: list, size: int = BATCH_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def collect_group(record: dict, groups: dict, lessons: dict, links: set):
+    groups[record["name"]] = {"name": record["name"], "course": int(record["course"]),
+                              "academic_name": record["academic_name"]}
+    for day in record["lessons"]:
+        for lessons_ in record["lessons"][day]:
+            for lesson in lessons_["lessons"]:
+                row = {"time_start": models.lesson_time(lessons_["time_start"]),
+                       "time_end": models.lesson_time(lessons_["time_end"]),
+                       "dot": lesson["dot"],
+                       "cabinet": lesson["cabinet"],
+                       "type": lesson["lesson_type"],
+                       "weeks": lesson["weeks"],
+                       "name": lesson["lesson_name"],
+                       "subgroup": lesson["subgroup"],
+                       "date_start": models.lesson_date(lesson["date_start"]),
+                       "date_end": models.lesson_date(lesson["date_end"]),
+                       "day": day,
+                       "group_name": record["name"]}
+                row["fingerprint"] = models.lesson_fingerprint(row["name"], row["day"], row["time_start"],
+                                                               row["time_end"], row["weeks"],
+                                                               row["date_start"], row["date_end"])
+                row["day_index"], row["slot"], row["week_mask"] = models.lesson_grid_position(
+                    row["day"], row["time_start"], row["weeks"])
+                lessons[(row["group_name"], row["fingerprint"])] = row
+                for teacher_name in lesson["teacher_name"]:
+                    if teacher_name is not None:
+                        links.add((row["group_name"], row["fingerprint"], teacher_name))
+
+
+def lesson_change(action: str, lesson_id: int, group_name: str, row: dict = None):
+    data = None
+    if row is not None:
+        data = {"name": row["name"],
+                "day": row["day"],
+                "time_start": row["time_start"].strftime(models.LESSON_TIME_FORMAT)
+                if row["time_start"] is not None else None,
+                "time_end": row["time_end"].strftime(models.LESSON_TIME_FORMAT) if row["time_end"] is not None else None,
+                "dot": row["dot"],
+                "cabinet": row["cabinet"],
+                "type": row["type"],
+                "weeks": models.lesson_weeks(row["week_mask"]),
+                "subgroup": row["subgroup"],
+                "date_start": row["date_start"].strftime(models.LESSON_DATE_FORMAT)
+                if row["date_start"] is not None else None,
+                "date_end": row["date_end"].strftime(models.LESSON_DATE_FORMAT) if row["date_end"] is not None else None}
+    return {"kind": "lesson", "action": action, "group_name": group_name, "lesson_id": lesson_id, "teacher_id": None,
+            "data": data}
+
+
+def link_change(action: str, lesson_id: int, group_name: str, teacher_id: int, teacher_name: str):
+    return {"kind": "lesson_teacher", "action": action, "group_name": group_name, "lesson_id": lesson_id,
+            "teacher_id": teacher_id, "data": {"teacher_name": teacher_name}}
+
+
+def record_changes(db: Session, changes: list):
+    # versions follow the list order: deleted lessons, inserted / updated lessons, deleted links, inserted links
+    statement = insert(models.ScheduleChange)
+    for batch in batches(changes):
+        db.execute(statement, batch)
+
+
+def prune_changes(db: Session, keep: int):
+    last = db.query(func.max(models.ScheduleChange.version)).scalar()
+    if last is not None and last > keep:
+        db.execute(delete(models.ScheduleChange).where(models.ScheduleChange.version <= last - keep))
+
+
+def import_groups(db: Session, groups: dict, stats: dict):
+    existing = {}
+    for names in batches(list(groups)):
+        for name, course, academic_name in db.query(models.Group.name, models.Group.course,
+                                                    models.Group.academic_name) \
+                .filter(models.Group.name.in_(names)):
+            existing[name] = (course, academic_name)
+
+    changed = [row for name, row in groups.items() if existing.get(name) != (row["course"], row["academic_name"])]
+    stats["inserted"] += len([row for row in changed if row["name"] not in existing])
+    stats["updated"] += len([row for row in changed if row["name"] in existing])
+
+    statement = insert(models.Group)
+    statement = statement.on_conflict_do_update(index_elements=[models.Group.name],
+                                                set_={"course": statement.excluded.course,
+                                                      "academic_name": statement.excluded.academic_name})
+    for batch in batches(changed):
+        db.execute(statement, batch)
+
+
+def import_teachers(db: Session, names: set, stats: dict):
+    teachers = {}
+    for batch in batches(list(names)):
+        for _id_, name in db.query(models.Teacher.id, models.Teacher.name).filter(models.Teacher.name.in_(batch)):
+            teachers[name] = _id_
+
+    missing = [{"name": name, "fullname": "", "online_url": "", "alt_online_url": ""}
+               for name in names if name not in teachers]
+    statement = insert(models.Teacher).on_conflict_do_nothing(index_elements=[models.Teacher.name])
+    for batch in batches(missing):
+        db.execute(statement, batch)
+    stats["inserted"] += len(missing)
+
+    for batch in batches([row["name"] for row in missing]):
+        for _id_, name in db.query(models.Teacher.id, models.Teacher.name).filter(models.Teacher.name.in_(batch)):
+            teachers[name] = _id_
+    return teachers
+
+
+def import_lessons(db: Session, group_names: list, lessons: dict, stats: dict, links_stats: dict, changes: list):
+    columns = [getattr(models.Lesson, field) for field in LESSON_FIELDS]
+    existing = {}
+    for batch in batches(group_names):
+        for row in db.query(models.Lesson.id, models.Lesson.group_name, models.Lesson.fingerprint, *columns) \
+                .filter(models.Lesson.group_name.in_(batch)):
+            existing[(row.group_name, row.fingerprint)] = row
+
+    changed = []
+    for key, row in lessons.items():
+        if key not in existing:
+            stats["inserted"] += 1
+            changed.append(row)
+        elif any(getattr(existing[key], field) != row[field] for field in LESSON_FIELDS):
+            stats["updated"] += 1
+            changed.append(row)
+    stale = [row for key, row in existing.items() if key not in lessons]
+    stats["deleted"] += len(stale)
+    # links of deleted lessons go with them, the log has no separate entries for them
+    changes.extend(lesson_change("delete", row.id, row.group_name) for row in stale)
+    stale = [row.id for row in stale]
+
+    for batch in batches(stale):
+        links_stats["deleted"] += db.execute(delete(models.LessonTeacher)
+                                             .where(models.LessonTeacher.lesson_id.in_(batch))).rowcount
+        db.execute(delete(models.Lesson).where(models.Lesson.id.in_(batch)))
+
+    statement = insert(models.Lesson)
+    statement = statement.on_conflict_do_update(index_elements=[models.Lesson.group_name, models.Lesson.fingerprint],
+                                                set_={field: statement.excluded[field] for field in LESSON_FIELDS})
+    for batch in batches(changed):
+        db.execute(statement, batch)
+
+    res = {}
+    for batch in batches(group_names):
+        for _id_, group_name, fingerprint in db.query(models.Lesson.id, models.Lesson.group_name,
+                                                      models.Lesson.fingerprint) \
+                .filter(models.Lesson.group_name.in_(batch)):
+            res[(group_name, fingerprint)] = _id_
+    changes.extend(lesson_change("insert" if (row["group_name"], row["fingerprint"]) not in existing else "update",
+                                 res[(row["group_name"], row["fingerprint"])], row["group_name"], row)
+                   for row in changed)
+    return res
+
+
+def import_links(db: Session, lesson_ids: dict, teacher_ids: dict, links: set, stats: dict, changes: list):
+    wanted = {(lesson_ids[(group_name, fingerprint)], teacher_ids[teacher_name])
+              for group_name, fingerprint, teacher_name in links}
+    existing = set()
+    for batch in batches(list(lesson_ids.values())):
+        for lesson_id, teacher_id in db.query(models.LessonTeacher.lesson_id, models.LessonTeacher.teacher_id) \
+                .filter(models.LessonTeacher.lesson_id.in_(batch)):
+            existing.add((lesson_id, teacher_id))
+
+    missing = [{"lesson_id": lesson_id, "teacher_id": teacher_id} for lesson_id, teacher_id in wanted - existing]
+    stale = list(existing - wanted)
+    stats["inserted"] += len(missing)
+    stats["deleted"] += len(stale)
+
+    group_names = {_id_: group_name for (group_name, _), _id_ in lesson_ids.items()}
+    teacher_names = {_id_: name for name, _id_ in teacher_ids.items()}
+    # teachers of removed links may not be in the schedule anymore
+    for batch in batches(list({teacher_id for _, teacher_id in stale if teacher_id not in teacher_names})):
+        for _id_, name in db.query(models.Teacher.id, models.Teacher.name).filter(models.Teacher.id.in_(batch)):
+            teacher_names[_id_] = name
+    changes.extend(link_change("delete", lesson_id, group_names[lesson_id], teacher_id, teacher_names[teacher_id])
+                   for lesson_id, teacher_id in stale)
+    changes.extend(link_change("insert", row["lesson_id"], group_names[row["lesson_id"]], row["teacher_id"],
+                               teacher_names[row["teacher_id"]]) for row in missing)
+
+    for batch in batches(stale):
+        db.execute(delete(models.LessonTeacher)
+                   .where(tuple_(models.LessonTeacher.lesson_id, models.LessonTeacher.teacher_id).in_(batch)))
+    statement = insert(models.LessonTeacher).on_conflict_do_nothing()
+    for batch in batches(missing):
+        db.execute(statement, batch)
+
+
+def teacher_shortname(fullname: str):
+    # "Фамилия Имя Отчество" -> "Фамилия И.О.", the form used in the schedule
+    words = fullname.split()
+    if len(words) < 2:
+        return None
+    return words[0] + " " + "".join(word[0] + "." for word in words[1:3])
+
+
+def import_teacher_fullnames(db: Session, fullnames: list):
+    # every teacher gets the scraped fullname whose short form is its name, in one UPDATE ... FROM (VALUES ...)
+    candidates = {}
+    for fullname in fullnames:
+        fullname = " ".join(fullname.split())
+        candidates.setdefault(teacher_shortname(fullname), set()).add(fullname)
+    current = {}
+    for batch in batches([name for name in candidates if name is not None]):
+        for name, fullname in db.query(models.Teacher.name, models.Teacher.fullname) \
+                .filter(models.Teacher.name.in_(batch)):
+            current[name] = fullname
+
+    res = {"updated": 0,
+           "unmatched": sorted(fullname for name, names in candidates.items() if name not in current
+                               for fullname in names),
+           "ambiguous": {}}
+    changes = []
+    for name, fullname in current.items():
+        if len(candidates[name]) > 1:
+            # several people share the short form: keep the fullname the teacher already has, never guess
+            res["ambiguous"][name] = sorted(candidates[name])
+            continue
+        new_fullname = next(iter(candidates[name]))
+        if new_fullname != fullname:
+            changes.append((name, new_fullname))
+
+    try:
+        for batch in batches(changes):
+            rows = values(column("name", String), column("fullname", String), name="new_fullnames").data(batch)
+            res["updated"] += db.execute(update(models.Teacher).where(models.Teacher.name == rows.c.name)
+                                         .values(fullname=rows.c.fullname)).rowcount
+        db.commit()
+    except (Exception,):
+        db.rollback()
+        raise
+    return res
+
+
+def import_schedule(db: Session, records, only_groups: set = None, keep_changes: int = None):
+    # records: iterable of group schedules {"name", "course", "academic_name", "lessons"}, consumed in batches
+    # of GROUP_BATCH_SIZE groups; only_groups limits the import to these groups; every change goes to the
+    # schedule_changes log in the same transaction, the log is cut to its keep_changes last entries
+    started = time.time()
+    stats = {table: {"inserted": 0, "updated": 0, "deleted": 0}
+             for table in ["groups", "teachers", "lessons", "lessons_teachers"]}
+
+    teacher_ids = {}
+    try:
+        batch = []
+        for record in records:
+            if only_groups is None or record["name"] in only_groups:
+                batch.append(record)
+            if len(batch) == GROUP_BATCH_SIZE:
+                import_batch(db, batch, teacher_ids, stats)
+                batch = []
+        if len(batch) != 0:
+            import_batch(db, batch, teacher_ids, stats)
+        if keep_changes is not None:
+            prune_changes(db, keep_changes)
+        db.commit()
+    except (Exception,):
+        db.rollback()
+        raise
+
+    stats["seconds"] = round(time.time() - started, 3)
+    return stats
+
+
+def import_batch(db: Session, records: list, teacher_ids: dict, stats: dict):
+    groups = {}
+    lessons = {}
+    links = set()
+    for record in records:
+        collect_group(record, groups, lessons, links)
+
+    import_groups(db, groups, stats["groups"])
+    teacher_ids.update(import_teachers(db, {teacher_name for _, _, teacher_name in links
+                                            if teacher_name not in teacher_ids}, stats["teachers"]))
+    changes = []
+    lesson_ids = import_lessons(db, list(groups), lessons, stats["lessons"], stats["lessons_teachers"], changes)
+    import_links(db, lesson_ids, teacher_ids, links, stats["lessons_teachers"], changes)
+    record_changes(db, changes)
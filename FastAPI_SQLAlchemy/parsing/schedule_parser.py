@@ -1,4 +1,9 @@
+import hashlib
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 
 import html2text
 import lxml.html
@@ -15,13 +20,79 @@ headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/
 DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday']
 
 
-def getText(url):
+class RateLimiter:
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def makeSession(pool_size):
     session = requests.Session()
     retry = Retry(connect=3, backoff_factor=0.5)
-    adapter = HTTPAdapter(max_retries=retry)
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
     session.mount('http://', adapter)
     session.mount('https://', adapter)
-    return session.get(url, headers=headers).text
+    session.headers.update(headers)
+    return session
+
+
+session = makeSession(settings.CRAWL_CONCURRENCY)
+rate_limiter = RateLimiter(settings.CRAWL_RATE_LIMIT)
+# the crawl (parse_schedule) and the import (input_parse_info.schedule_info_to_db) run as different jobs,
+# both hold this lock while they use the schedule files and changed_groups.json
+schedule_files_lock = threading.RLock()
+
+
+def getText(url):
+    rate_limiter.wait(url)
+    return session.get(url).text
+
+
+def getTextIfChanged(url, validators):
+    # returns (None, validators) when the page did not change since the crawl that produced validators
+    request_headers = {}
+    if validators.get("etag") is not None:
+        request_headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified") is not None:
+        request_headers["If-Modified-Since"] = validators["last_modified"]
+    rate_limiter.wait(url)
+    response = session.get(url, headers=request_headers)
+    if response.status_code == 304:
+        return None, validators
+    new_validators = {"etag": response.headers.get("ETag"),
+                      "last_modified": response.headers.get("Last-Modified"),
+                      "hash": hashlib.sha1(response.content).hexdigest()}
+    if new_validators["hash"] == validators.get("hash"):
+        return None, new_validators
+    return response.text, new_validators
+
+
+def fetchAll(func, items, concurrency=settings.CRAWL_CONCURRENCY):
+    # results come back in the order of items
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(func, items))
+
+
+def fetchIter(func, items, concurrency=settings.CRAWL_CONCURRENCY):
+    # like fetchAll, but yields results as soon as they are ready and keeps at most 2 * concurrency in flight
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = deque()
+        for item in items:
+            futures.append(executor.submit(func, item))
+            if len(futures) >= 2 * concurrency:
+                yield futures.popleft().result()
+        while len(futures) != 0:
+            yield futures.popleft().result()
 
 
 def getAcademicTypes():
@@ -71,8 +142,7 @@ def getTeachersFullname():
         categories.append(settings.URL_HOME_MEPHI + item[0].attrib['href'])
 
     res = {"teachers_fullname": []}
-    for category in categories:
-        text = getText(category)
+    for text in fetchAll(getText, categories):
         tree = etree.HTML(text)
         for item in tree.xpath("//a[@class='list-group-item']"):
             res["teachers_fullname"].append(item.text.replace('\n', ''))
@@ -85,7 +155,10 @@ def setTeachersFullname(filename, obj, mode, encoding, indent, ensure_ascii):
 
 
 def getGroupSchedule(url):
-    text = getText(url)
+    return parseGroupSchedule(getText(url))
+
+
+def parseGroupSchedule(text):
     tree = etree.HTML(text)
     schedule = {}
     i = 0
@@ -161,29 +234,97 @@ def getGroupSchedule(url):
     return schedule
 
 
-def setInfoToFile(dict_json, filename, mode, encoding, indent, ensure_ascii):
-    dict_dump = {"name": filename.split(".")[0],
-                 "courses": []}
-    i = 0
-    for course in dict_json["courses"]:
-        dict_dump["courses"].append({"name": course["name"].split()[0],
-                                     "groups": []})
-        for group in course["groups"]:
-            print("   " + group["name"])
-            dict_dump["courses"][i]["groups"].append({"name": group["name"],
-                                                      "lessons": getGroupSchedule(group["url"])})
-        i += 1
+def loadJson(filename, default):
+    if not os.path.exists(filename):
+        return default
+    with open(filename, 'r', encoding='utf-8') as fp:
+        return json.load(fp)
+
+
+def dumpJson(filename, obj):
+    # written aside and renamed, a reader sees the previous file or the new one, never a half-written one
+    with open(filename + ".tmp", 'w', encoding='utf-8') as fp:
+        json.dump(obj, fp=fp, ensure_ascii=False)
+    os.replace(filename + ".tmp", filename)
+
+
+def indexJsonLines(filename):
+    # group name -> byte offset of its line
+    res = {}
+    if os.path.exists(filename):
+        with open(filename, 'rb') as fp:
+            offset = fp.tell()
+            line = fp.readline()
+            while len(line) > 0:
+                res[json.loads(line)["name"]] = offset
+                offset = fp.tell()
+                line = fp.readline()
+    return res
+
 
-    with open(filename, mode, encoding=encoding) as fp:
-        json.dump(dict_dump, fp=fp, indent=indent, ensure_ascii=ensure_ascii)
+def readJsonLine(filename, offset):
+    with open(filename, 'rb') as fp:
+        fp.seek(offset)
+        return fp.readline().decode('utf-8')
+
+
+def iterJsonLines(filename):
+    with open(filename, 'r', encoding='utf-8') as fp:
+        for line in fp:
+            if len(line.strip()) > 0:
+                yield json.loads(line)
+
+
+def setInfoToFile(dict_json, academic, filename, crawl_state):
+    # one group per line, so neither the crawler nor the importer holds the whole schedule in memory
+    previous = indexJsonLines(filename)
+
+    def getGroup(item):
+        course, group = item
+        # unchanged pages are not parsed again, their line is copied from the previous crawl
+        validators = crawl_state.get(group["url"], {}) if group["name"] in previous else {}
+        text, crawl_state[group["url"]] = getTextIfChanged(group["url"], validators)
+        if text is None:
+            return readJsonLine(filename, previous[group["name"]]), False
+        record = {"name": group["name"],
+                  "course": course["name"].split()[0],
+                  "academic_name": academic,
+                  "lessons": parseGroupSchedule(text)}
+        return json.dumps(record, ensure_ascii=False) + "\n", True
+
+    groups = [(course, group) for course in dict_json["courses"] for group in course["groups"]]
+    changed = []
+    with open(filename + ".tmp", 'w', encoding='utf-8') as fp:
+        for (line, is_changed), (course, group) in zip(fetchIter(getGroup, groups), groups):
+            if is_changed:
+                print("   " + group["name"])
+                changed.append(group["name"])
+            fp.write(line)
+    os.replace(filename + ".tmp", filename)
+    return changed
+
+
+def updateChangedGroups(added=(), imported=()):
+    with schedule_files_lock:
+        changed = set(loadJson(settings.CHANGED_GROUPS_PATH, {"groups": []})["groups"])
+        changed = (changed | set(added)) - set(imported)
+        dumpJson(settings.CHANGED_GROUPS_PATH, {"groups": sorted(changed)})
+        return sorted(changed)
 
 
 def parse_schedule():
-    for academic in ['Специалитет']:
-        print(academic + ":")
-        groups_list = getAcademicGroupList(academic, url=settings.URL_ALL_SCHEDULE)
-        setInfoToFile(groups_list, "FastAPI_SQLAlchemy/parsing/schedule/" + academic + ".json", mode='w',
-                      encoding='utf-8', indent=3, ensure_ascii=False)
+    with schedule_files_lock:
+        crawl_state = loadJson(settings.CRAWL_STATE_PATH, {})
+        changed = set()
+        for academic in ['Специалитет']:
+            print(academic + ":")
+            groups_list = getAcademicGroupList(academic, url=settings.URL_ALL_SCHEDULE)
+            changed_groups = setInfoToFile(groups_list, academic, settings.SCHEDULE_DIR + academic + ".jsonl",
+                                           crawl_state=crawl_state)
+            print("Changed groups: {}".format(len(changed_groups)))
+            changed.update(changed_groups)
+        dumpJson(settings.CRAWL_STATE_PATH, crawl_state)
+        return updateChangedGroups(added=changed)
 
 
 def parse_teachers_fullname():
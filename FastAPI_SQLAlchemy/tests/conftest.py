@@ -0,0 +1,51 @@
+import os
+import tempfile
+
+# settings are read when the app modules are imported, so the tests always get a throwaway SQLite database
+TMP_DIR = tempfile.mkdtemp(prefix="fastapi_sqlalchemy_tests_")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(TMP_DIR, "test.db")
+os.environ["ASYNC_DATABASE_URL"] = "sqlite+aiosqlite:///" + os.path.join(TMP_DIR, "test.db")
+os.environ["TRANSLATION_CACHE_PATH"] = os.path.join(TMP_DIR, "translations.sqlite3")
+
+import functools
+import http.server
+import shutil
+import threading
+
+import pytest
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def read_fixture(path: str):
+    with open(os.path.join(FIXTURES_DIR, path), encoding="utf-8") as fp:
+        return fp.read()
+
+
+class SiteHandler(http.server.SimpleHTTPRequestHandler):
+    # like the real sites, pages declare their charset
+    extensions_map = {**http.server.SimpleHTTPRequestHandler.extensions_map, ".html": "text/html; charset=utf-8"}
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def site(tmp_path):
+    # site("schedule") copies fixtures/schedule to a temporary directory and serves it on a local port,
+    # returns (base url, directory), pages can be changed during the test; answers 304 on If-Modified-Since
+    servers = []
+
+    def serve(name: str):
+        directory = str(tmp_path / "site" / name)
+        shutil.copytree(os.path.join(FIXTURES_DIR, name), directory)
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(SiteHandler,
+                                                                                      directory=directory))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return "http://127.0.0.1:{}".format(server.server_port), directory
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
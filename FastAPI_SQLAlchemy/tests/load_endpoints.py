@@ -0,0 +1,65 @@
+# Load test of the read endpoints: throughput and latency at growing concurrency. Not collected by pytest.
+#
+#   RESPONSE_CACHE_SIZE=0 uvicorn FastAPI_SQLAlchemy.main:app --port 8000 &
+#   python FastAPI_SQLAlchemy/tests/load_endpoints.py --url http://127.0.0.1:8000 --group Б20-101 \
+#       --teacher "Иванов И.И." --concurrency 1 4 16 64
+#
+# RESPONSE_CACHE_SIZE=0 turns the schedule response cache off, so every request goes to the database.
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import statistics
+import threading
+import time
+
+import requests
+
+
+def run_level(paths: list, concurrency: int, requests_count: int):
+    local = threading.local()
+
+    def request(i):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        started = time.perf_counter()
+        response = local.session.get(paths[i % len(paths)])
+        return response.status_code, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        res = list(executor.map(request, range(requests_count)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for _, latency in res)
+    return {"concurrency": concurrency,
+            "requests": requests_count,
+            "errors": len([status for status, _ in res if status != 200]),
+            "rps": requests_count / elapsed,
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--group", required=True)
+    parser.add_argument("--teacher", required=True)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    paths = [args.url + "/all_lessons_by_group/?group_name={}&lang=ru".format(args.group),
+             args.url + "/all_lessons_by_teacher/?teacher_name={}&lang=ru".format(args.teacher),
+             args.url + "/teacher_info/?teacher_name={}&lang=ru".format(args.teacher),
+             args.url + "/all_groups/"]
+    for path in paths:
+        requests.get(path).raise_for_status()
+
+    print("{:>11} {:>8} {:>6} {:>9} {:>8} {:>8}".format("concurrency", "requests", "errors", "req/s", "p50 ms",
+                                                       "p95 ms"))
+    for concurrency in args.concurrency:
+        res = run_level(paths, concurrency, args.requests)
+        print("{concurrency:>11} {requests:>8} {errors:>6} {rps:>9.1f} {p50_ms:>8.1f} {p95_ms:>8.1f}".format(**res))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import asyncio
+
+from sqlalchemy import event
+
+from FastAPI_SQLAlchemy._fastapi_ import async_crud, tools
+from FastAPI_SQLAlchemy._fastapi_.db import models
+from FastAPI_SQLAlchemy._fastapi_.db.database import Base, engine, async_engine, SessionLocal, AsyncSessionLocal
+
+MANY_LESSONS = 40
+
+
+def add_group(db, name: str, lessons_count: int, teachers: list):
+    db.add(models.Group(name=name, course=1, academic_name="Специалитет"))
+    for i in range(lessons_count):
+        day = models.LESSON_DAYS[i % len(models.LESSON_DAYS)]
+        time_start, time_end = models.LESSON_SLOTS[i % len(models.LESSON_SLOTS)]
+        day_index, slot, week_mask = models.lesson_grid_position(day, time_start, "еженед")
+        lesson = models.Lesson(name="Lesson {}".format(i), type="Лек", cabinet="A-{}".format(i), dot=False,
+                               subgroup=None, weeks="еженед", day=day, time_start=time_start, time_end=time_end,
+                               date_start=None, date_end=None, group_name=name, day_index=day_index, slot=slot,
+                               week_mask=week_mask)
+        lesson.fingerprint = models.lesson_fingerprint(lesson.name, day, time_start, time_end, "еженед", None, None)
+        db.add(lesson)
+        db.flush()
+        for teacher in teachers:
+            db.add(models.LessonTeacher(lesson_id=lesson.id, teacher_id=teacher.id))
+
+
+def setup_module():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        teachers = [models.Teacher(name="Teacher {}".format(i), fullname="Teacher Fullname {}".format(i))
+                    for i in range(2)]
+        db.add_all(teachers)
+        db.flush()
+        add_group(db, "ONE", 1, teachers)
+        add_group(db, "MANY", MANY_LESSONS, teachers)
+        db.commit()
+    finally:
+        db.close()
+
+
+def group_schedule(group_name: str):
+    # statements executed to build the /all_lessons_by_group/ schedule of the group
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            db_lessons = await async_crud.get_lessons_by_GroupName(db, group_name)
+            return tools.output_From_DBLesson(db_lessons, dest='ru')
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        res = asyncio.run(run())
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        asyncio.run(async_engine.dispose())
+    return res, statements
+
+
+def grid_lessons(res: dict):
+    return [lesson for day in res["schedule"].values() for slot in day["lessons"] for lesson in slot]
+
+
+def test_group_schedule_query_count_does_not_grow_with_lessons():
+    one, one_statements = group_schedule("ONE")
+    many, many_statements = group_schedule("MANY")
+    assert len(grid_lessons(one)) == 1
+    assert len(grid_lessons(many)) == MANY_LESSONS
+    assert len(many_statements) == len(one_statements)
+
+
+def test_group_schedule_carries_teachers():
+    res, _ = group_schedule("MANY")
+    for lesson in grid_lessons(res):
+        assert lesson.teacher_name == ["Teacher 0", "Teacher 1"]
+        assert lesson.teacher_fullname == ["Teacher Fullname 0", "Teacher Fullname 1"]
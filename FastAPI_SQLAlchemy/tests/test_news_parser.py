@@ -0,0 +1,105 @@
+import json
+import os
+import threading
+
+from FastAPI_SQLAlchemy.parsing import news_parser as np
+from FastAPI_SQLAlchemy.parsing import schedule_parser as sp
+from FastAPI_SQLAlchemy.tests.conftest import read_fixture
+
+
+def news_site(site, monkeypatch, tmp_path):
+    url, directory = site("news")
+    monkeypatch.setattr(np.settings, "HOST_URL", url)
+    monkeypatch.setattr(np.settings, "PREVIEW_DIR", str(tmp_path / "preview") + "/")
+    monkeypatch.setattr(np.settings, "NEWS_DIR", str(tmp_path / "news") + "/")
+    return url, directory
+
+
+def stored_news(tmp_path, category: str):
+    news_dir = tmp_path / "news" / category
+    urls = sp.loadJson(str(news_dir / np.settings.NEWS_INDEX_NAME), {"urls": []})["urls"]
+    res = []
+    for number in range(1, len(urls) + 1):
+        with open(news_dir / "{}.json".format(number), encoding="utf-8") as fp:
+            res.append((urls[number - 1], json.load(fp)["title"]))
+    return res
+
+
+def test_parse_listing():
+    previews, next_page = np.parse_listing(read_fixture("news/listing.html"))
+    assert [(preview["url"], preview["date"], preview["text"]) for preview in previews] == \
+           [(np.settings.HOST_URL + "/articles/3.html", "03.03.2023", "Третья новость"),
+            (np.settings.HOST_URL + "/articles/2.html", "02.03.2023", "Вторая новость")]
+    assert previews[0]["img_url"] == "/images/preview-3.jpg"
+    assert next_page == np.settings.HOST_URL + "/listing-2.html"
+    assert np.parse_listing(read_fixture("news/listing-2.html"))[1] is None
+
+
+def test_parse_article():
+    article = np.parse_article(read_fixture("news/articles/2.html"))
+    assert (article["title"], article["date"]) == ("Вторая новость", "2 марта 2023")
+    assert article["images_url"] == [np.settings.HOST_URL + "/images/article-2.jpg"]
+    assert "Текст новости номер 2." in article["text"]
+
+
+def test_iter_previews_follows_the_pager(site, monkeypatch, tmp_path):
+    url, _ = news_site(site, monkeypatch, tmp_path)
+    assert [preview["url"] for preview in np.iter_previews(url + "/listing.html")] == \
+           [url + "/articles/3.html", url + "/articles/2.html", url + "/articles/1.html"]
+
+
+def test_parse_category_is_incremental(site, monkeypatch, tmp_path):
+    url, _ = news_site(site, monkeypatch, tmp_path)
+    assert np.parse_category(("main", url + "/listing.html")) == 3
+    # files are numbered from the oldest news
+    assert stored_news(tmp_path, "main") == [(url + "/articles/1.html", "Первая новость"),
+                                             (url + "/articles/2.html", "Вторая новость"),
+                                             (url + "/articles/3.html", "Третья новость")]
+
+    # a new news was published: only it is downloaded, paging stops at the first stored news
+    assert np.parse_category(("main", url + "/listing-new.html")) == 1
+    assert stored_news(tmp_path, "main")[3] == (url + "/articles/4.html", "Четвёртая новость")
+    assert np.parse_category(("main", url + "/listing-new.html")) == 0
+    assert len(stored_news(tmp_path, "main")) == 4
+
+
+def test_parse_category_retries_failed_articles(site, monkeypatch, tmp_path):
+    url, directory = news_site(site, monkeypatch, tmp_path)
+    article = os.path.join(directory, "articles", "2.html")
+    os.rename(article, article + ".bak")
+    # the 2nd news can not be downloaded: the 3rd one is newer, storing it would hide the 2nd one for good
+    assert np.parse_category(("main", url + "/listing.html")) == 1
+    assert stored_news(tmp_path, "main") == [(url + "/articles/1.html", "Первая новость")]
+
+    os.rename(article + ".bak", article)
+    assert np.parse_category(("main", url + "/listing.html")) == 2
+    assert stored_news(tmp_path, "main") == [(url + "/articles/1.html", "Первая новость"),
+                                             (url + "/articles/2.html", "Вторая новость"),
+                                             (url + "/articles/3.html", "Третья новость")]
+
+
+def test_parse_category_retries_failed_listing_pages(site, monkeypatch, tmp_path):
+    url, directory = news_site(site, monkeypatch, tmp_path)
+    listing = os.path.join(directory, "listing-2.html")
+    os.rename(listing, listing + ".bak")
+    # the 2nd listing page can not be read: storing the 3rd and 2nd news would hide the 1st one for good
+    assert np.parse_category(("main", url + "/listing.html")) == 0
+    assert stored_news(tmp_path, "main") == []
+
+    os.rename(listing + ".bak", listing)
+    assert np.parse_category(("main", url + "/listing.html")) == 3
+    assert [news[0] for news in stored_news(tmp_path, "main")] == \
+           [url + "/articles/1.html", url + "/articles/2.html", url + "/articles/3.html"]
+
+
+def test_parse_category_waits_for_an_import(site, monkeypatch, tmp_path):
+    url, _ = news_site(site, monkeypatch, tmp_path)
+    res = []
+    crawl = threading.Thread(target=lambda: res.append(np.parse_category(("main", url + "/listing.html"))))
+    # the import holds the lock while it reads the index and the files it lists
+    with np.news_files_lock:
+        crawl.start()
+        crawl.join(0.5)
+        assert crawl.is_alive() and stored_news(tmp_path, "main") == []
+    crawl.join()
+    assert res == [3] and len(stored_news(tmp_path, "main")) == 3
@@ -0,0 +1,91 @@
+import os
+import time
+
+from FastAPI_SQLAlchemy.parsing import schedule_parser as sp
+from FastAPI_SQLAlchemy.tests.conftest import read_fixture
+
+
+def read_lines(filename):
+    return {record["name"]: record for record in sp.iterJsonLines(filename)}
+
+
+def touch(path: str, text: str = None):
+    # new content with a modification time the previous crawl can not have seen
+    if text is not None:
+        with open(path, "w", encoding="utf-8") as fp:
+            fp.write(text)
+    stamp = time.time() + 60
+    os.utime(path, (stamp, stamp))
+
+
+def test_parse_group_schedule():
+    schedule = sp.parseGroupSchedule(read_fixture("schedule/groups/s20-101.html"))
+    assert list(schedule) == ["monday", "tuesday"]
+    assert [(item["time_start"], item["time_end"]) for item in schedule["monday"]] == [("08:30", "10:05"),
+                                                                                     ("10:15", "11:45")]
+    lecture = schedule["monday"][0]["lessons"][0]
+    assert (lecture["lesson_name"], lecture["lesson_type"], lecture["cabinet"], lecture["dot"], lecture["weeks"]) == \
+           ("Математический анализ", "Лек", "А-100", False, "еженед")
+    assert lecture["teacher_name"] == ["Иванов И.И."]
+    assert (lecture["date_start"], lecture["date_end"]) == (None, None)
+
+    practice, lab = schedule["monday"][1]["lessons"]
+    assert (practice["subgroup"], practice["weeks"]) == ("1 подгруппа", "нечет")
+    assert practice["teacher_name"] == ["Петров П.П.", "Сидорова А.А."]
+    assert (practice["date_start"], practice["date_end"]) == ("01.02.2023", "17.05.2023")
+    assert (lab["dot"], lab["cabinet"], lab["weeks"]) == (True, None, "чет")
+    assert (lab["date_start"], lab["date_end"]) == ("15.02.2023", None)
+
+
+def test_group_list(site, monkeypatch):
+    url, _ = site("schedule")
+    monkeypatch.setattr(sp.settings, "URL_HOME_MEPHI", url)
+    monkeypatch.setattr(sp.settings, "URL_ALL_SCHEDULE", url + "/study_groups.html")
+    assert sp.getAcademicTypes() == ["Специалитет", "Магистратура"]
+
+    groups_list = sp.getAcademicGroupList("Специалитет", url + "/study_groups.html")
+    assert [(course["name"], [group["name"] for group in course["groups"]]) for course in groups_list["courses"]] == \
+           [("1 курс", ["С20-101", "С20-102"]), ("2 курс", ["С19-201"])]
+    assert groups_list["courses"][0]["groups"][0]["url"] == url + "/groups/s20-101.html"
+
+
+def test_set_info_to_file_is_incremental(site, monkeypatch, tmp_path):
+    url, directory = site("schedule")
+    monkeypatch.setattr(sp.settings, "URL_HOME_MEPHI", url)
+    groups_list = sp.getAcademicGroupList("Специалитет", url + "/study_groups.html")
+    filename = str(tmp_path / "Специалитет.jsonl")
+    crawl_state = {}
+
+    # first crawl: every group is downloaded, one JSON line per group in the order of the group list
+    assert sp.setInfoToFile(groups_list, "Специалитет", filename, crawl_state) == ["С20-101", "С20-102", "С19-201"]
+    records = read_lines(filename)
+    assert list(records) == ["С20-101", "С20-102", "С19-201"]
+    assert (records["С19-201"]["course"], records["С19-201"]["academic_name"]) == ("2", "Специалитет")
+    assert records["С20-102"]["lessons"]["monday"][0]["lessons"][0]["cabinet"] == "А-102"
+    assert set(crawl_state) == {group["url"] for course in groups_list["courses"] for group in course["groups"]}
+    first_crawl = open(filename, encoding="utf-8").read()
+
+    # nothing changed: the server answers 304 and the lines are copied from the previous file
+    assert sp.setInfoToFile(groups_list, "Специалитет", filename, crawl_state) == []
+    assert open(filename, encoding="utf-8").read() == first_crawl
+
+    # one page changed, another one was only touched (same content, new Last-Modified)
+    page = os.path.join(directory, "groups", "s20-102.html")
+    touch(page, read_fixture("schedule/groups/s20-102.html").replace("А-102", "А-999"))
+    touch(os.path.join(directory, "groups", "s19-201.html"))
+    assert sp.setInfoToFile(groups_list, "Специалитет", filename, crawl_state) == ["С20-102"]
+    assert read_lines(filename)["С20-102"]["lessons"]["monday"][0]["lessons"][0]["cabinet"] == "А-999"
+    # the lines of the other groups are copied as they are
+    lines = open(filename, encoding="utf-8").read().splitlines()
+    first_lines = first_crawl.splitlines()
+    assert (lines[0], lines[2]) == (first_lines[0], first_lines[2])
+
+
+def test_import_keeps_groups_changed_by_a_later_crawl(monkeypatch, tmp_path):
+    monkeypatch.setattr(sp.settings, "CHANGED_GROUPS_PATH", str(tmp_path / "changed_groups.json"))
+    assert sp.updateChangedGroups(added=["С20-101", "С20-102"]) == ["С20-101", "С20-102"]
+    # the import read the list, then a crawl found another changed group
+    only_groups = set(sp.loadJson(sp.settings.CHANGED_GROUPS_PATH, {"groups": []})["groups"])
+    sp.updateChangedGroups(added=["С19-201"])
+    assert sp.updateChangedGroups(imported=only_groups) == ["С19-201"]
+    assert sp.loadJson(sp.settings.CHANGED_GROUPS_PATH, None) == {"groups": ["С19-201"]}
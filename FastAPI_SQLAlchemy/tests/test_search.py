@@ -0,0 +1,42 @@
+from sqlalchemy import select
+
+from FastAPI_SQLAlchemy._fastapi_ import async_crud
+from FastAPI_SQLAlchemy._fastapi_.db import models
+from FastAPI_SQLAlchemy._fastapi_.db.database import Base, engine, SessionLocal
+
+TEACHERS = [("Ивлев П.П.", "Ивлев Пётр Петрович"),
+            ("Сидоров А.И.", "Сидоров Алексей Иванович"),
+            ("Петров И.С.", "Петров Иван Сергеевич"),
+            ("Иванов И.И.", "Иванов Иван Иванович")]
+
+
+def setup_module():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.add_all([models.Teacher(name=name, fullname=fullname) for name, fullname in TEACHERS])
+        db.commit()
+    finally:
+        db.close()
+
+
+def ranked_teachers(query: str):
+    # the prefix part of the /search/ ordering, the fuzzy part needs pg_trgm
+    db = SessionLocal()
+    try:
+        return db.execute(select(models.Teacher.name)
+                          .order_by(async_crud.teacher_prefix_rank(async_crud.like_prefix(query)),
+                                    models.Teacher.name)).scalars().all()
+    finally:
+        db.close()
+
+
+def test_teacher_prefix_rank():
+    # short name first, then a first name or patronymic that starts with the query, then the rest
+    assert ranked_teachers("Иван") == ["Иванов И.И.", "Петров И.С.", "Сидоров А.И.", "Ивлев П.П."]
+    assert ranked_teachers("Пётр") == ["Ивлев П.П.", "Иванов И.И.", "Петров И.С.", "Сидоров А.И."]
+
+
+def test_teacher_prefix_rank_escapes_like_wildcards():
+    assert ranked_teachers("%") == sorted(name for name, _ in TEACHERS)
@@ -1,5 +1,12 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import sqlite3
+import threading
+
 from multipledispatch import dispatch
 
+from FastAPI_SQLAlchemy.config import settings
+
 # from googletrans import Translator, constants
 #
 # translator = Translator()
@@ -8,6 +15,130 @@ from yandex.Translater import Translater
 
 translator = Translater()
 
+# provider limits for a single request
+REQUEST_CHAR_LIMIT = 5000
+REQUEST_SEGMENT_LIMIT = 100
+
+executor = ThreadPoolExecutor(max_workers=settings.translation_workers, thread_name_prefix="translator")
+
+
+class TranslationCache:
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.connection = None
+
+    def _connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute("CREATE TABLE IF NOT EXISTS translations ("
+                                    "source TEXT NOT NULL, dest TEXT NOT NULL, text TEXT NOT NULL, "
+                                    "PRIMARY KEY (source, dest))")
+        return self.connection
+
+    def _remember(self, source: str, dest: str, text: str):
+        self.memory[(source, dest)] = text
+        self.memory.move_to_end((source, dest))
+        if len(self.memory) > self.size:
+            self.memory.popitem(last=False)
+
+    def get_many(self, strings: list, dest: str):
+        res = {}
+        with self.lock:
+            missing = []
+            for string in strings:
+                if (string, dest) in self.memory:
+                    self.memory.move_to_end((string, dest))
+                    res[string] = self.memory[(string, dest)]
+                else:
+                    missing.append(string)
+            if len(missing) == 0:
+                return res
+            connection = self._connect()
+            for i in range(0, len(missing), 500):
+                part = missing[i:i + 500]
+                rows = connection.execute("SELECT source, text FROM translations WHERE dest = ? AND source IN ({})"
+                                          .format(", ".join("?" * len(part))), [dest] + part).fetchall()
+                for source, text in rows:
+                    res[source] = text
+                    self._remember(source, dest, text)
+        return res
+
+    def set_many(self, translations: dict, dest: str):
+        with self.lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany("INSERT OR REPLACE INTO translations (source, dest, text) VALUES (?, ?, ?)",
+                                       [(source, dest, text) for source, text in translations.items()])
+            for source, text in translations.items():
+                self._remember(source, dest, text)
+
+
+cache = TranslationCache(settings.translation_cache_path, settings.translation_cache_size)
+
+
+def translate_many(strings: list, dest='en'):
+    if dest == 'ru':
+        return list(strings)
+    unique = list(dict.fromkeys(string for string in strings if string))
+    res = cache.get_many(unique, dest)
+    missing = [string for string in unique if string not in res]
+    if len(missing) != 0:
+        translated = dict(zip(missing, translate_batch(missing, dest=dest)))
+        cache.set_many(translated, dest)
+        res.update(translated)
+    return [res.get(string, string) for string in strings]
+
+
+def translate_batch(segments: list, dest='en'):
+    # segments longer than a request are split into pieces and glued back together after translation
+    pieces = []
+    owners = []
+    for i in range(0, len(segments)):
+        for piece in tr_split(segments[i], REQUEST_CHAR_LIMIT):
+            pieces.append(piece)
+            owners.append(i)
+
+    chunks = [[pieces[i] for i in chunk] for chunk in chunk_pieces(pieces)]
+    if len(chunks) == 1:
+        results = [translate_chunk(chunks[0], dest)]
+    else:
+        results = list(executor.map(lambda chunk: translate_chunk(chunk, dest), chunks))
+
+    res = [[] for _ in segments]
+    i = 0
+    for result in results:
+        for text in result:
+            res[owners[i]].append(text)
+            i += 1
+    return [" ".join(texts) for texts in res]
+
+
+def chunk_pieces(pieces: list):
+    chunks = []
+    chunk = []
+    length = 0
+    for i in range(0, len(pieces)):
+        if len(chunk) != 0 and (length + len(pieces[i]) > REQUEST_CHAR_LIMIT or len(chunk) == REQUEST_SEGMENT_LIMIT):
+            chunks.append(chunk)
+            chunk = []
+            length = 0
+        chunk.append(i)
+        length += len(pieces[i])
+    if len(chunk) != 0:
+        chunks.append(chunk)
+    return chunks
+
+
+def translate_chunk(chunk: list, dest: str):
+    res = [item.text for item in translator.translate(chunk, dest=dest)]
+    if len(res) != len(chunk):
+        raise ValueError("Translator returned {} segments instead of {}".format(len(res), len(chunk)))
+    return res
+
+
 @dispatch(dict)
 def translate(text: dict, dest='en'):
     if dest != 'ru':
@@ -27,18 +158,18 @@ def translate(text: list, dest='en'):
 @dispatch(str)
 def translate(text: str, dest='en'):
     if dest != 'ru':
-        res = ""
-        for substr in tr_split(text, 5000):
-            res += translator.translate(substr, dest=dest).text
-        return res
+        return translate_many([text], dest=dest)[0]
     return text
 
 
 def tr_split(text: str, length: int):
-    if len(text) <= length:
-        return [text]
     res = []
-    for i in range(0, len(text) // length):
-        res.append(text[i * length:(i + 1) * length])
-    res.append(text[(len(text) // length)*length:])
+    while len(text) > length:
+        # cut on the last whitespace so words are not broken between requests
+        pos = text.rfind(" ", 0, length)
+        if pos <= 0:
+            pos = length
+        res.append(text[:pos])
+        text = text[pos:].lstrip()
+    res.append(text)
     return res